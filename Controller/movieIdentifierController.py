@@ -1,11 +1,23 @@
+import asyncio
 from Service.TrailerSearchService import TrailerSearchService
+from fastapi import UploadFile
 from pathlib import Path
 
 parent_dir = Path(__file__).resolve().parent.parent
 
 search_service = TrailerSearchService()
 
-results = search_service.search("Paul Atreides_Feyd-Rautha.mp4", top_k=3)
+
+async def search_local_scene(video_path, top_k):
+
+    try:
+        with open(video_path, "rb") as vf:
+            return await search_service.search(UploadFile(file=vf, filename=Path(video_path).name), top_k=top_k)
+    finally:
+        await search_service.aclose()
+
+
+results = asyncio.run(search_local_scene("Paul Atreides_Feyd-Rautha.mp4", top_k=3))
 
 for match in results:
 
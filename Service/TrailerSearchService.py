@@ -1,81 +1,351 @@
-import os 
-import requests
-import numpy as np
-from pathlib import Path
-from os.path import basename
-from models.response_model import SearchResult
+import os
+import asyncio
+import threading
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from models.response_model import SearchResult, BatchSearchItem
+from Service.embedding_client import EmbeddingClient
+from Service.search_cache import SearchCache
+from Service.micro_batcher import MicroBatcher
+from Service.index_handle import IndexHandle
+from Service.db_manager import get_db_manager
 from dotenv import load_dotenv
-from chromadb import PersistentClient
 
 load_dotenv()
 
-embedding_service_url = os.getenv("EMBEDDING_SERVICE_URL")
+class TrailerSearchService:
 
-parent_dir = Path(__file__).resolve().parent.parent
+    def __init__(self, db_path=None,  num_frames = None, query_workers = None, embedding_mode = None, reload_interval = None):
 
-path_chromadb = parent_dir / "chromaDB"
+        self.num_frames = int(num_frames or os.getenv("NUMBER_OF_FRAMES", 100))
 
-class TrailerSearchService:
+        # Initialize ChromaDB; without an explicit db_path the service follows the version DbManager serves
+        self.db_path = db_path
 
-    def __init__(self, db_path=str(path_chromadb),  num_frames = None):
+        self.index_lock = threading.Lock()
 
-        self.num_frames = int(num_frames or os.getenv("NUMBER_OF_FRAMES", 100))
+        # the watcher and DbManager's listener can both see a new CURRENT; one resolve, open and swap at a time
+        self.reload_lock = threading.Lock()
+
+        self.index = self.open_index()
+
+        # how often the CURRENT pointer is checked for updates made by another process
+        self.reload_interval = float(reload_interval or os.getenv("INDEX_RELOAD_INTERVAL", 30))
+
+        self.watch_task = None
+
+        # collection.query is blocking, so it runs on a bounded pool off the event loop
+        self.query_workers = int(query_workers or os.getenv("CHROMA_QUERY_WORKERS", 4))
 
-        # Initialize ChromaDB
-        self.client = PersistentClient(path=db_path)
+        self.query_executor = ThreadPoolExecutor(max_workers=self.query_workers, thread_name_prefix="chroma-query")
 
-        self.collection = self.client.get_or_create_collection(name="moviesTrailerEmbeddings")
+        # "remote" posts clips to EMBEDDING_SERVICE_URL, "local" runs the ingestion CLIP model in-process
+        self.embedding_mode = (embedding_mode or os.getenv("EMBEDDING_MODE", "remote")).lower()
 
+        if self.embedding_mode == "local":
+            from Service.local_embedding_client import LocalEmbeddingClient
+            self.embedding_client = LocalEmbeddingClient(num_frames=self.num_frames)
 
+        elif self.embedding_mode == "remote":
+            self.embedding_client = EmbeddingClient()
 
-    def embed_video_scene(self, video_path):
+        else:
+            raise ValueError(f"Unknown EMBEDDING_MODE: {self.embedding_mode}")
+
+        self.cache = SearchCache()
 
-        with open(video_path, "rb") as vf:
-            files = {"file": (basename(video_path), vf, "video/mp4")}
-            response = requests.post(embedding_service_url, files=files)
+        # concurrent searches within a few milliseconds of each other share one multi-vector query
+        self.query_batcher = MicroBatcher(
+            self.query_batch,
+            max_size=int(os.getenv("SEARCH_BATCH_MAX_SIZE", 32)),
+            max_wait=float(os.getenv("SEARCH_BATCH_MAX_WAIT_MS", 2)) / 1000,
+        )
 
-        response.raise_for_status()
+        # and, when the embedding backend can take several clips at once, one embedding call
+        self.embed_batcher = None
+        if hasattr(self.embedding_client, "embed_many"):
+            self.embed_batcher = MicroBatcher(
+                self.embedding_client.embed_many,
+                max_size=int(os.getenv("EMBED_BATCH_MAX_SIZE", 8)),
+                max_wait=float(os.getenv("EMBED_BATCH_MAX_WAIT_MS", 5)) / 1000,
+            )
 
-        embedding = response.json()["embedding"]
 
-        if isinstance(embedding, list):
-            embedding = np.array(embedding, dtype=np.float32)
 
-        elif isinstance(embedding, np.ndarray):
-            embedding = embedding.astype(np.float32)
+    async def embed_video_scene(self, upload):
 
+        if self.embed_batcher is not None:
+            embedding = await self.embed_batcher.submit(upload)
         else:
-            raise ValueError("Unexpected type for embedding: {}".format(type(embedding)))
-        
-        if embedding is None:
-            raise ValueError("Embedding not found in response")
-        
-        print(f"✅Successfully embedded video scene from {video_path}, embedding shape: {embedding.shape}")
+            embedding = await self.embedding_client.embed(upload)
+
+        print(f"✅Successfully embedded video scene from {upload.filename}, embedding shape: {embedding.shape}")
 
         return embedding
 
 
 
-    def search(self, video_path: str, top_k: int = 5):
+    @property
+    def collection(self):
+
+        return self.index.collection
+
+
+
+    def resolve_index(self):
+
+        if self.db_path is not None:
+            return str(self.db_path), None
+
+        dbManager = get_db_manager()
+
+        return str(dbManager.current_db_path()), dbManager.current_version()
+
+
+
+    def open_index(self):
+
+        db_path, version = self.resolve_index()
+
+        index = IndexHandle(db_path, version)
+        index.warm()
+
+        return index
+
+
+
+    def reload_index(self):
+
+        # blocking: opens and warms the new version first, then swaps it in under the lock
+        with self.reload_lock:
+            db_path, version = self.resolve_index()
+
+            if db_path == self.index.db_path and version == self.index.version:
+                if not self.index.is_stale():
+                    return False
+
+                self.index.refresh()
+                self.cache.clear()
+
+                print(f"🔄 Search index exports refreshed for {self.index.version or self.index.db_path}")
+                return True
+
+            new_index = IndexHandle(db_path, version)
+
+            try:
+                new_index.warm()
+            except Exception:
+                new_index.close()
+                raise
+
+            with self.index_lock:
+                old_index, self.index = self.index, new_index
+
+            self.cache.clear()
+
+            # queries already running finish on the old handle, it closes when the last one releases it
+            old_index.retire()
+
+            print(f"🔄 Search index switched to {version or db_path}")
+            return True
+
+
+
+    def acquire_index(self):
+
+        with self.index_lock:
+            return self.index.acquire()
+
+
+
+    async def watch_index(self):
+
+        loop = asyncio.get_running_loop()
+
+        while True:
+            await asyncio.sleep(self.reload_interval)
+
+            try:
+                await loop.run_in_executor(None, self.reload_index)
+            except Exception as e:
+                print(f"⚠️ Index reload failed, still serving {self.index.version or self.index.db_path}: {e}")
+
+
+
+    def start_index_watcher(self):
+
+        if self.watch_task is None and self.db_path is None:
+            self.watch_task = asyncio.get_running_loop().create_task(self.watch_index())
+
+
+
+    async def query_collection(self, index, vectors, top_k: int):
+
+        loop = asyncio.get_running_loop()
+
+        return await loop.run_in_executor(
+            self.query_executor,
+            partial(index.query, vectors, top_k),
+        )
+
+
+
+    async def get_scene_embedding(self, upload):
+
+        # hash the clip first so repeat submissions skip the embedding service entirely
+        clip_hash = await self.cache.hash_upload(upload)
+
+        vector = self.cache.get_embedding(clip_hash)
 
+        if vector is None:
+            vector = await self.embed_video_scene(upload)
+            self.cache.put_embedding(clip_hash, vector)
+
+        return vector
+
+
+
+    def format_results(self, results, row: int):
+
+        formatted_results = []
+        for i in range(len(results["ids"][row])):
+
+            result = SearchResult(
+                id=results["ids"][row][i],
+                document=results["documents"][row][i],
+                metadata=results["metadatas"][row][i],
+                distance=float(results["distances"][row][i])
+            )
+
+            # the scene index also says where in the trailer the match is
+            if "start_times" in results:
+                result.start_time = results["start_times"][row][i]
+                result.end_time = results["end_times"][row][i]
+
+            formatted_results.append(result)
+
+        return formatted_results
+
+
+
+    async def query_batch(self, items):
+
+        # items: (vector, top_k) from any number of callers; one query at the largest top_k, trimmed per caller
+        top_k = max(k for _, k in items)
+
+        index = self.acquire_index()
         try:
+            results = await self.query_collection(index, [vector.tolist() for vector, _ in items], top_k)
+        finally:
+            index.release()
+
+        return [(self.format_results(results, row)[:k], index) for row, (_, k) in enumerate(items)]
+
+
+
+    async def search_vectors(self, vectors, top_k: int):
+
+        vector_hashes = [self.cache.vector_key(vector) for vector in vectors]
+
+        matches = [self.cache.get_results(vector_hash, top_k) for vector_hash in vector_hashes]
+
+        pending = [i for i, match in enumerate(matches) if match is None]
+
+        # cache misses join the shared batch alongside other requests' vectors
+        if pending:
+            answers = await asyncio.gather(*(self.query_batcher.submit((vectors[i], top_k)) for i in pending))
+
+            for i, (match, index) in zip(pending, answers):
+                matches[i] = match
+
+                # results from a handle that was swapped out mid-query must not land in the fresh cache
+                if index is self.index:
+                    self.cache.put_results(vector_hashes[i], top_k, matches[i])
+
+        return matches
+
+
+
+    def batching_stats(self):
+
+        return {
+            "queries": self.query_batcher.stats(),
+            "embeddings": self.embed_batcher.stats() if self.embed_batcher is not None else None,
+        }
+
 
-            vector = self.embed_video_scene(video_path)
 
-            results = self.collection.query(query_embeddings=[vector.tolist()], n_results=top_k)
+    async def search(self, upload, top_k: int = 5):
 
-            formatted_results = []
-            for i in range(len(results["ids"][0])):
+        try:
+
+            vector = await self.get_scene_embedding(upload)
 
-                result = SearchResult(
-                    id=results["ids"][0][i],
-                    document=results["documents"][0][i],
-                    metadata=results["metadatas"][0][i],
-                    distance=float(results["distances"][0][i])
-                )
-                formatted_results.append(result)
+            matches = await self.search_vectors([vector], top_k)
+
+            return matches[0]
 
-            return formatted_results
-        
         except Exception as e:
-            raise e
\ No newline at end of file
+            raise e
+
+
+
+    async def search_batch(self, uploads, top_k: int = 5):
+
+        embeddings = await asyncio.gather(
+            *(self.get_scene_embedding(upload) for upload in uploads),
+            return_exceptions=True,
+        )
+
+        items = [BatchSearchItem(filename=upload.filename or f"file_{i}") for i, upload in enumerate(uploads)]
+
+        embedded = [i for i, embedding in enumerate(embeddings) if not isinstance(embedding, BaseException)]
+
+        for i, embedding in enumerate(embeddings):
+            if isinstance(embedding, BaseException):
+                items[i].error = f"Embedding failed: {embedding}"
+
+        if embedded:
+            try:
+                matches = await self.search_vectors([embeddings[i] for i in embedded], top_k)
+
+                for i, match in zip(embedded, matches):
+                    items[i].results = match
+
+            except Exception as e:
+                for i in embedded:
+                    items[i].error = f"Search failed: {e}"
+
+        return items
+
+
+
+    def status(self):
+
+        # what the readiness probe reports: the version being served and whether it has been warmed
+        return {**self.index.status(), "embedding_mode": self.embedding_mode}
+
+
+
+    def on_index_updated(self):
+
+        # called by DbManager after a swap or rollback in this process
+        if not self.reload_index():
+            self.cache.clear()
+
+
+
+    async def aclose(self):
+
+        if self.watch_task is not None:
+            self.watch_task.cancel()
+
+        self.query_batcher.close()
+        if self.embed_batcher is not None:
+            self.embed_batcher.close()
+
+        await self.embedding_client.aclose()
+
+        self.query_executor.shutdown(wait=False)
+
+        self.index.retire()
@@ -1,55 +1,258 @@
-from io import BytesIO
 from pathlib import Path
 import zipfile
-import requests
+import hashlib
 import shutil
 import os
+import itertools
 from datetime import datetime
+from Service.snapshot_manager import SnapshotManager
+
+COLLECTION_NAME = "moviesTrailerEmbeddings"
+SCENE_COLLECTION_NAME = "moviesTrailerScenes"
+
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+def close_chroma_client(client):
+    # chromadb keeps one system per path with its files open until that system stops, which blocks renaming or
+    # deleting the directory (Windows refuses) and reopening it cleanly; the public close() releases this
+    # client's reference and stops the system with the last one. Without it the files stay open until exit.
+    close = getattr(client, "close", None)
+    if close is None:
+        print("⚠️ This chromadb has no Client.close(), the index stays open until the process exits")
+        return
+
+    close()
 
 class DbManager:
 
     def __init__(self):
         self.parent_dir = Path(__file__).resolve().parent.parent
-        self.CHROMA_DB_PATH = Path(os.getenv("CHROMA_DB_PATH", self.parent_dir / "chroma_db"))
+        # the same directory ingestion writes to and search reads from
+        self.CHROMA_DB_PATH = Path(os.getenv("CHROMA_DB_PATH", self.parent_dir / "chromaDB"))
         self.BACKUP_DIR = Path(os.getenv("BACKUP_DIR", self.parent_dir / "db_backups"))
         self.NEW_DB_ZIP_URL = os.getenv("NEW_DB_ZIP_URL")
+        self.NEW_DB_ZIP_SHA256 = os.getenv("NEW_DB_ZIP_SHA256")
+        self.KEEP_VERSIONS = int(os.getenv("CHROMA_KEEP_VERSIONS", 3))
+        # a stored vector only has to come back among this many neighbours, exact duplicates may tie ahead of it
+        self.VALIDATE_TOP_K = int(os.getenv("CHROMA_VALIDATE_TOP_K", 10))
+
+        # every downloaded index lives in its own directory, CURRENT names the one being served
+        self.VERSIONS_DIR = self.CHROMA_DB_PATH / "versions"
+        self.DOWNLOAD_DIR = self.CHROMA_DB_PATH / "downloads"
+        self.CURRENT_FILE = self.CHROMA_DB_PATH / "CURRENT"
+
+        self.snapshots = SnapshotManager(self.BACKUP_DIR)
+
+        self.update_listeners = []
+
+        self.name_counter = itertools.count()
+
+    def add_update_listener(self, callback):
+        self.update_listeners.append(callback)
+
+    def notify_update_listeners(self):
+        for callback in self.update_listeners:
+            callback()
+
+    def new_name(self, label: str = "") -> str:
+        # sorts by time like the old second-resolution names; microseconds, the pid and a counter keep two
+        # updates in the same second, or from two processes, off the same directory or zip
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        return f"{stamp}_{os.getpid()}_{next(self.name_counter)}{label}"
+
+    def current_version(self):
+        if self.CURRENT_FILE.exists():
+            return self.CURRENT_FILE.read_text().strip() or None
+        return None
+
+    def current_db_path(self) -> Path:
+        version = self.current_version()
+        if version and (self.VERSIONS_DIR / version).exists():
+            return self.VERSIONS_DIR / version
+
+        # trees from before versioning keep the DB directly in CHROMA_DB_PATH
+        return self.CHROMA_DB_PATH
+
+    def list_versions(self):
+        if not self.VERSIONS_DIR.exists():
+            return []
+        return sorted(p.name for p in self.VERSIONS_DIR.iterdir() if p.is_dir() and not p.name.endswith(".tmp"))
 
     def backup_current_db(self):
         if self.CHROMA_DB_PATH.exists():
-            self.BACKUP_DIR.mkdir(exist_ok=True)
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            backup_path = self.BACKUP_DIR / f"chroma_db_backup_{timestamp}"
-            shutil.copytree(self.CHROMA_DB_PATH, backup_path)
-            print(f"📁 DB backed up to {backup_path}")
+            name = self.snapshots.create(self.current_db_path())
+            print(f"📁 DB backed up to {self.BACKUP_DIR / name}")
+            return name
 
-    def delete_existing_chromadb(self):
-        if self.CHROMA_DB_PATH.exists():
-            shutil.rmtree(self.CHROMA_DB_PATH)
+    def restore_snapshot(self, name: str):
+        if name not in self.snapshots.list_snapshots():
+            raise Exception(f"Unknown snapshot {name}")
+
+        # the copy happens beside the live index, switching to it is the same pointer swap as an update
+        version = self.new_name(f"_restore_{name}")
+
+        self.VERSIONS_DIR.mkdir(parents=True, exist_ok=True)
+        self.snapshots.materialize(name, self.VERSIONS_DIR / version)
 
-    def download_chromadb_zip(self, url: str = None) -> BytesIO:
+        self.swap_current(version)
+        self.notify_update_listeners()
+        self.prune_versions()
+
+        print(f"⏪ Restored snapshot {name} as version {version}")
+        return version
+
+    def download_chromadb_zip(self, url: str = None, expected_sha256: str = None) -> Path:
         url = url or self.NEW_DB_ZIP_URL
-        response = requests.get(url)
-        if response.status_code != 200:
-            raise Exception("Failed to download new DB")
-        return BytesIO(response.content)
+        expected_sha256 = expected_sha256 or self.NEW_DB_ZIP_SHA256
+
+        self.DOWNLOAD_DIR.mkdir(parents=True, exist_ok=True)
+        zip_path = self.DOWNLOAD_DIR / f"chroma_db_{self.new_name()}.zip"
+
+        import requests
+
+        # streamed straight to disk, memory stays at one chunk however big the archive is
+        digest = hashlib.sha256()
+        try:
+            with requests.get(url, stream=True, timeout=(10, 300)) as response:
+                if response.status_code != 200:
+                    raise Exception("Failed to download new DB")
+
+                with open(zip_path, "wb") as f:
+                    for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                        f.write(chunk)
+                        digest.update(chunk)
+
+            if expected_sha256 and digest.hexdigest().lower() != expected_sha256.strip().lower():
+                raise Exception(f"Checksum mismatch for new DB: expected {expected_sha256}, got {digest.hexdigest()}")
+
+        except Exception:
+            zip_path.unlink(missing_ok=True)
+            raise
+
+        return zip_path
+
+    def staging_path(self, version: str) -> Path:
+        # list_versions skips .tmp directories, nothing can roll back to a version that never validated
+        return self.VERSIONS_DIR / f"{version}.tmp"
 
-    def extract_zip_to_path(self, zip_bytes: BytesIO):
-        with zipfile.ZipFile(zip_bytes) as zip_ref:
-            zip_ref.extractall(self.CHROMA_DB_PATH)
+    def extract_zip_to_path(self, zip_path: Path, version: str) -> Path:
+        # returns the DB root inside the staging directory, publish_version gives it its version name
+        self.VERSIONS_DIR.mkdir(parents=True, exist_ok=True)
+        staging = self.staging_path(version)
+        shutil.rmtree(staging, ignore_errors=True)
 
-    def update_chromadb(self, zip_url: str = None):
+        with zipfile.ZipFile(zip_path) as zip_ref:
+            zip_ref.extractall(staging)
+
+        # archives made by zipping the chroma_db folder itself carry one extra level
+        root = staging
+        entries = list(staging.iterdir())
+        if not (staging / "chroma.sqlite3").exists() and len(entries) == 1 and entries[0].is_dir():
+            root = entries[0]
+
+        return root
+
+    def publish_version(self, root: Path, version: str) -> Path:
+        target = self.VERSIONS_DIR / version
+        os.replace(root, target)
+        shutil.rmtree(self.staging_path(version), ignore_errors=True)
+
+        return target
+
+    def validate_db(self, db_path: Path):
+        import chromadb
+
+        client = chromadb.PersistentClient(path=str(db_path))
+        try:
+            collection = client.get_collection(COLLECTION_NAME)
+
+            if collection.count() == 0:
+                raise Exception(f"New DB at {db_path} has an empty '{COLLECTION_NAME}' collection")
+
+            # a stored vector has to come back among its own nearest neighbours
+            sample = collection.get(limit=1, include=["embeddings"])
+            top_k = max(1, min(self.VALIDATE_TOP_K, collection.count()))
+            hits = collection.query(query_embeddings=[sample["embeddings"][0]], n_results=top_k, include=[])
+
+            if sample["ids"][0] not in hits["ids"][0]:
+                raise Exception(f"Validation query against {db_path} did not return the sampled vector in its top {top_k}")
+
+        finally:
+            close_chroma_client(client)
+
+    def swap_current(self, version: str):
+        # a rename over the pointer is atomic, readers see either the old version or the new one
+        tmp = self.CHROMA_DB_PATH / "CURRENT.tmp"
+        tmp.write_text(version)
+        os.replace(tmp, self.CURRENT_FILE)
+
+    def prune_versions(self):
+        current = self.current_version()
+        versions = [v for v in self.list_versions() if v != current]
+
+        for version in versions[:max(0, len(versions) - (self.KEEP_VERSIONS - 1))]:
+            shutil.rmtree(self.VERSIONS_DIR / version, ignore_errors=True)
+            print(f"🧹 Removed old DB version {version}")
+
+    def rollback(self, version: str = None):
+        versions = self.list_versions()
+        current = self.current_version()
+
+        if version is None:
+            older = [v for v in versions if current is None or v < current]
+            if not older:
+                raise Exception("No older DB version to roll back to")
+            version = older[-1]
+
+        if version not in versions:
+            raise Exception(f"Unknown DB version {version}")
+
+        self.swap_current(version)
+        self.notify_update_listeners()
+
+        print(f"⏪ Rolled back DB to {version}")
+        return version
+
+    def update_chromadb(self, zip_url: str = None, expected_sha256: str = None):
         print("📦 Backing up existing DB...")
         self.backup_current_db()
 
-        print("🗑️ Deleting old DB...")
-        self.delete_existing_chromadb()
-
         print("⬇️ Downloading new DB...")
-        zip_bytes = self.download_chromadb_zip(zip_url)
+        zip_path = self.download_chromadb_zip(zip_url, expected_sha256)
+
+        version = self.new_name()
+
+        try:
+            print("📦 Extracting new DB...")
+            staged = self.extract_zip_to_path(zip_path, version)
+        finally:
+            zip_path.unlink(missing_ok=True)
+
+        # validated in staging with its client closed again, only a DB that passes gets its version name
+        print("🔎 Validating new DB...")
+        try:
+            self.validate_db(staged)
+        except Exception:
+            shutil.rmtree(self.staging_path(version), ignore_errors=True)
+            raise
+
+        self.publish_version(staged, version)
+
+        # the live index is untouched until here, search never sees a missing or half-written DB
+        self.swap_current(version)
+
+        self.notify_update_listeners()
+
+        self.prune_versions()
 
-        print("📦 Extracting new DB...")
-        self.extract_zip_to_path(zip_bytes)
+        print(f"✅ DB update complete, serving version {version}.")
+        return version
 
-        print("✅ DB update complete.")
+db_manager = None
 
-dbManager = DbManager()
+def get_db_manager() -> DbManager:
+    # built on first use, after .env is loaded, instead of as a side effect of importing this module
+    global db_manager
+    if db_manager is None:
+        db_manager = DbManager()
+    return db_manager
@@ -0,0 +1,157 @@
+import os
+import json
+import httpx
+import random
+import asyncio
+import numpy as np
+from uuid import uuid4
+from os.path import basename
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# failures worth another attempt: the connection dropped or never came up
+RETRYABLE_ERRORS = (
+    httpx.ConnectError,
+    httpx.ConnectTimeout,
+    httpx.PoolTimeout,
+    httpx.ReadError,
+    httpx.WriteError,
+    httpx.RemoteProtocolError,
+)
+
+
+class EmbeddingServiceError(Exception):
+    pass
+
+
+class EmbeddingClient:
+
+    def __init__(self, url = None, connect_timeout = None, read_timeout = None, max_retries = None,
+                 backoff_base = None, backoff_max = None, max_in_flight = None, keepalive_expiry = None):
+
+        self.url = url or os.getenv("EMBEDDING_SERVICE_URL")
+
+        self.max_retries = int(max_retries if max_retries is not None else os.getenv("EMBEDDING_MAX_RETRIES", 3))
+
+        self.backoff_base = float(backoff_base or os.getenv("EMBEDDING_BACKOFF_BASE", 0.25))
+
+        self.backoff_max = float(backoff_max or os.getenv("EMBEDDING_BACKOFF_MAX", 4.0))
+
+        self.max_in_flight = int(max_in_flight or os.getenv("EMBEDDING_MAX_IN_FLIGHT", 8))
+
+        connect_timeout = float(connect_timeout or os.getenv("EMBEDDING_CONNECT_TIMEOUT", 5.0))
+
+        read_timeout = float(read_timeout or os.getenv("EMBEDDING_READ_TIMEOUT", 60.0))
+
+        keepalive_expiry = float(keepalive_expiry or os.getenv("EMBEDDING_KEEPALIVE_EXPIRY", 60.0))
+
+        # one pooled client for the lifetime of the service, so connections are reused across queries
+        self.http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(connect=connect_timeout, read=read_timeout, write=read_timeout, pool=None),
+            limits=httpx.Limits(
+                max_connections=self.max_in_flight,
+                max_keepalive_connections=self.max_in_flight,
+                keepalive_expiry=keepalive_expiry,
+            ),
+        )
+
+        self._in_flight = asyncio.Semaphore(self.max_in_flight)
+
+
+
+    async def _multipart_body(self, upload, boundary):
+
+        filename = basename(upload.filename or "scene.mp4")
+
+        yield (
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+            "Content-Type: video/mp4\r\n\r\n"
+        ).encode("utf-8")
+
+        while chunk := await upload.read(UPLOAD_CHUNK_SIZE):
+            yield chunk
+
+        yield f"\r\n--{boundary}--\r\n".encode("utf-8")
+
+
+
+    def _backoff(self, attempt):
+
+        # full jitter keeps retrying callers from hammering the service in lockstep
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+
+
+    def decode_embedding(self, content: bytes):
+
+        # parse the flat "embedding": [...] array straight into float32 without a list of Python floats
+        key = content.find(b'"embedding"')
+        start = content.find(b"[", key)
+        end = content.find(b"]", start)
+
+        if key == -1 or start == -1 or end == -1:
+            raise EmbeddingServiceError("Embedding not found in response")
+
+        raw = content[start + 1:end]
+
+        if b"[" not in raw:
+            embedding = np.fromstring(raw.decode("ascii"), dtype=np.float32, sep=",")
+
+            if embedding.size == raw.count(b",") + 1:
+                return embedding
+
+        # anything unusual (nested arrays, nulls) goes through the regular JSON decoder
+        embedding = json.loads(content).get("embedding")
+
+        if embedding is None:
+            raise EmbeddingServiceError("Embedding not found in response")
+
+        return np.asarray(embedding, dtype=np.float32).ravel()
+
+
+
+    async def embed(self, upload):
+
+        attempt = 0
+
+        while True:
+
+            # the body is a one-shot stream, so every attempt starts from the top of the upload
+            await upload.seek(0)
+
+            boundary = uuid4().hex
+
+            try:
+                async with self._in_flight:
+                    response = await self.http_client.post(
+                        self.url,
+                        content=self._multipart_body(upload, boundary),
+                        headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+                    )
+
+                if response.status_code < 500:
+                    response.raise_for_status()
+
+                    return self.decode_embedding(response.content)
+
+                error = EmbeddingServiceError(f"Embedding service returned {response.status_code}: {response.text[:200]}")
+
+            except RETRYABLE_ERRORS as e:
+                error = e
+
+            if attempt >= self.max_retries:
+                raise EmbeddingServiceError(f"Embedding request failed after {attempt + 1} attempts: {error}")
+
+            delay = self._backoff(attempt)
+            attempt += 1
+
+            print(f"⏳Embedding request failed ({error}), retrying in {delay:.2f}s (attempt {attempt}/{self.max_retries})")
+
+            await asyncio.sleep(delay)
+
+
+
+    async def aclose(self):
+
+        await self.http_client.aclose()
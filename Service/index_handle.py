@@ -0,0 +1,297 @@
+import os
+import time
+import shutil
+import threading
+from pathlib import Path
+from Service.db_manager import COLLECTION_NAME, SCENE_COLLECTION_NAME, close_chroma_client
+from Service.vector_index import NumpyVectorIndex
+from Service.scene_index import SceneIndex
+
+# chromadb shares one System per path between clients and stops it only when the last client on that path closes,
+# so two handles on one version (a reload racing a rollback, a version reopened while its old handle drains) stay usable;
+# the lock serializes client creation, the counts say whether a close released the path or just this handle
+open_clients = {}
+open_clients_lock = threading.Lock()
+
+# exported matrices live inside the version they were built from, one directory per collection size and write stamp
+NUMPY_INDEX_DIR = "numpy_index"
+SCENE_INDEX_DIR = "scene_index"
+
+CHROMA_SQLITE_FILE = "chroma.sqlite3"
+
+
+class IndexHandle:
+
+    # one opened index version; queries hold a reference so a retired handle closes only once they drain
+
+    def __init__(self, db_path, version=None, backend=None):
+
+        self.db_path = str(db_path)
+        self.version = version
+
+        self.vector_count = None
+        self.warmed_at = None
+
+        self.refs = 0
+        self.retired = False
+        self.closed = False
+
+        self.lock = threading.Lock()
+
+        # chromadb is slow to import, it loads with the first index rather than with the app
+        from chromadb import PersistentClient
+
+        with open_clients_lock:
+            self.client = PersistentClient(path=self.db_path)
+            open_clients[self.db_path] = open_clients.get(self.db_path, 0) + 1
+
+        try:
+            self.open_collections(backend)
+
+        except Exception:
+            self.close()
+            raise
+
+
+
+    def open_collections(self, backend):
+
+        self.collection = self.client.get_or_create_collection(name=COLLECTION_NAME)
+
+        # "chroma" queries the HNSW index, "numpy" scans an exported float32 matrix exactly
+        self.backend = (backend or os.getenv("SEARCH_BACKEND", "chroma")).lower()
+
+        if self.backend == "numpy":
+            self.searcher = self.load_numpy_index()
+
+        elif self.backend == "chroma":
+            self.searcher = self.collection
+
+        else:
+            raise ValueError(f"Unknown SEARCH_BACKEND: {self.backend}")
+
+        # with SEARCH_SCENES on, movies are ranked by their best matching scene once enough of the catalogue has scenes;
+        # below SCENE_MIN_COVERAGE, movies ingested before SCENE_INDEX was turned on would drop out of every result
+        self.scene_collection = None
+        self.scene_searcher = None
+        self.scene_coverage = 0.0
+        self.min_scene_coverage = float(os.getenv("SCENE_MIN_COVERAGE", 1.0))
+        # movies shortlisted at trailer level before scenes are scored, 0 scans every scene
+        self.scene_candidates = int(os.getenv("SCENE_CANDIDATE_MOVIES", 200))
+
+        if os.getenv("SEARCH_SCENES", "false").lower() in ("1", "true", "yes"):
+            self.scene_collection = self.client.get_or_create_collection(name=SCENE_COLLECTION_NAME)
+            self.scene_searcher = self.load_scene_index()
+            self.update_scene_coverage()
+
+
+
+    def warm(self):
+
+        # touches the sqlite file and segment metadata, then runs one query with a stored vector so the
+        # HNSW index (or the exported matrix) is loaded before the first real query lands on it
+        self.vector_count = self.collection.count()
+
+        if self.vector_count:
+            sample = self.collection.get(limit=1, include=["embeddings"])["embeddings"]
+            self.query([list(sample[0])], 1)
+
+        self.warmed_at = time.time()
+
+        return self.vector_count
+
+
+
+    def status(self):
+
+        return {
+            "index_version": self.version,
+            "db_path": self.db_path,
+            "backend": self.backend,
+            "vector_count": self.vector_count,
+            "scene_count": self.scene_searcher.count if self.scene_searcher is not None else 0,
+            "scene_coverage": round(self.scene_coverage, 4),
+            "scene_search": self.uses_scenes(),
+            "warm": self.warmed_at is not None,
+            "warmed_at": self.warmed_at,
+        }
+
+
+
+    def write_stamp(self):
+
+        # changes with every write to this version, upserts included, which leave the count alone;
+        # writes still sitting in the WAL change the database without touching its own mtime
+        sqlite_file = Path(self.db_path) / CHROMA_SQLITE_FILE
+
+        stamps = [f.stat().st_mtime_ns for f in (sqlite_file, sqlite_file.with_name(f"{CHROMA_SQLITE_FILE}-wal")) if f.exists()]
+
+        return max(stamps, default=0)
+
+
+
+    def export_name(self, collection):
+
+        # stamp first: a write landing during the export leaves a newer stamp behind, so the next check re-exports
+        stamp = self.write_stamp()
+
+        return f"n{collection.count()}_{stamp}"
+
+
+
+    def _load_export(self, collection, dirname, index_cls):
+
+        path = Path(self.db_path) / dirname / self.export_name(collection)
+        count = collection.count()
+
+        if path.exists():
+            return index_cls(path)
+
+        print(f"📤 Exporting {count} vectors from {self.version or self.db_path} into {dirname}")
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        return index_cls.export_collection(collection, path)
+
+
+
+    def load_numpy_index(self):
+
+        return self._load_export(self.collection, NUMPY_INDEX_DIR, NumpyVectorIndex)
+
+
+
+    def load_scene_index(self):
+
+        if self.scene_collection.count() == 0:
+            return None
+
+        return self._load_export(self.scene_collection, SCENE_INDEX_DIR, SceneIndex)
+
+
+
+    def is_stale(self):
+
+        # ingestion keeps adding to and upserting into the live collections, the exported matrices have to follow them
+        if self.backend == "numpy" and self.searcher.path.name != self.export_name(self.collection):
+            return True
+
+        if self.scene_collection is None:
+            return False
+
+        if self.scene_searcher is None:
+            return self.scene_collection.count() > 0
+
+        return self.scene_searcher.path.name != self.export_name(self.scene_collection)
+
+
+
+    def refresh(self):
+
+        old = [self.searcher, self.scene_searcher]
+
+        self.vector_count = self.collection.count()
+
+        if self.backend == "numpy":
+            self.searcher = self.load_numpy_index()
+
+        if self.scene_collection is not None:
+            self.scene_searcher = self.load_scene_index()
+            self.update_scene_coverage()
+
+        # queries holding an old map keep it alive, only the directory entry goes away
+        for previous, current in zip(old, [self.searcher, self.scene_searcher]):
+            if isinstance(previous, (NumpyVectorIndex, SceneIndex)) and (current is None or previous.path != current.path):
+                shutil.rmtree(previous.path, ignore_errors=True)
+
+
+
+    def update_scene_coverage(self):
+
+        # share of the trailer collection that has scenes, one SceneIndex movie per covered trailer
+        movies = len(self.scene_searcher.movies) if self.scene_searcher is not None else 0
+        count = self.collection.count()
+
+        self.scene_coverage = min(1.0, movies / count) if count else 0.0
+
+        if self.scene_searcher is not None and not self.uses_scenes():
+            print(f"⏸️ Scene search waiting for coverage: {movies}/{count} trailers have scenes "
+                  f"(SCENE_MIN_COVERAGE {self.min_scene_coverage:g}), serving trailer vectors")
+
+
+
+    def uses_scenes(self):
+
+        return self.scene_searcher is not None and self.scene_coverage >= self.min_scene_coverage
+
+
+
+    def query(self, vectors, top_k):
+
+        if not self.uses_scenes():
+            return self.searcher.query(query_embeddings=vectors, n_results=top_k)
+
+        if self.scene_candidates <= 0:
+            return self.scene_searcher.query(query_embeddings=vectors, n_results=top_k)
+
+        shortlist = self.searcher.query(query_embeddings=vectors, n_results=max(self.scene_candidates, top_k))
+
+        return self.scene_searcher.query(query_embeddings=vectors, n_results=top_k, candidates=shortlist["ids"])
+
+
+
+    def acquire(self):
+
+        with self.lock:
+            self.refs += 1
+
+        return self
+
+
+
+    def release(self):
+
+        with self.lock:
+            self.refs -= 1
+            drained = self.retired and self.refs == 0
+
+        if drained:
+            self.close()
+
+
+
+    def retire(self):
+
+        with self.lock:
+            self.retired = True
+            drained = self.refs == 0
+
+        if drained:
+            self.close()
+
+
+
+    def close(self):
+
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+
+        with open_clients_lock:
+            open_clients[self.db_path] -= 1
+            shared = open_clients[self.db_path] > 0
+            if not shared:
+                del open_clients[self.db_path]
+
+            # chromadb counts clients per path and only stops the shared system when the last one closes,
+            # so a later rollback to this version reopens cleanly
+            try:
+                close_chroma_client(self.client)
+
+            except Exception as e:
+                print(f"⚠️ Could not close index {self.version or self.db_path}: {e}")
+
+        if shared:
+            print(f"🔒 Released index {self.version or self.db_path}, still open in another handle")
+        else:
+            print(f"🔒 Closed index {self.version or self.db_path}")
@@ -0,0 +1,147 @@
+import os
+import asyncio
+import numpy as np
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from util.clip_embedder import ClipEmbedder
+from util.frame_sampler import FrameSampler
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+class LocalEmbeddingClient:
+
+    def __init__(self, onnx_path = None, num_frames = None, max_workers = None):
+
+        self.num_frames = int(num_frames or os.getenv("NUMBER_OF_FRAMES", 100))
+
+        # same model and preprocessing as ingestion, pinned to CPU for the API workers
+        self.embedder = ClipEmbedder(onnx_path, providers=['CPUExecutionProvider'])
+
+        self.embedder.warmup()
+
+        self.sampler = FrameSampler(num_frames=self.num_frames)
+
+        # onnxruntime already spreads one run over its intra-op threads, so a small pool is enough
+        self.max_workers = int(max_workers or os.getenv("LOCAL_EMBEDDING_WORKERS", 1))
+
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="clip-embed")
+
+        print(f"✅Loaded local CLIP model from {self.embedder.onnx_path} with providers {self.embedder.session.get_providers()}")
+
+
+
+    def _embed_file(self, video_path):
+
+        try:
+            frames = (frame for _, _, frame in self.sampler.sample(video_path))
+
+            embedding = self.embedder.embed_frames(frames)
+
+            if embedding is None:
+                raise ValueError("No frames could be read from the uploaded clip")
+
+            return embedding
+        finally:
+            os.remove(video_path)
+
+
+
+    def _embed_files(self, video_paths):
+
+        # frames from every clip share the same ONNX batches, so one clip's tail fills the next clip's head
+        sums = [None] * len(video_paths)
+        counts = [0] * len(video_paths)
+        errors = [None] * len(video_paths)
+
+        def frames():
+            for i, video_path in enumerate(video_paths):
+                try:
+                    for _, _, frame in self.sampler.sample(video_path):
+                        yield i, frame
+                except Exception as e:
+                    errors[i] = e
+
+        try:
+            batch, owners = [], []
+            for owner, frame in frames():
+                batch.append(frame)
+                owners.append(owner)
+
+                if len(batch) == self.embedder.batch_size:
+                    self._accumulate(self.embedder.embed_batch(batch), owners, sums, counts)
+                    batch, owners = [], []
+
+            if batch:
+                self._accumulate(self.embedder.embed_batch(batch), owners, sums, counts)
+
+        finally:
+            for video_path in video_paths:
+                os.remove(video_path)
+
+        results = []
+        for total, count, error in zip(sums, counts, errors):
+            if count:
+                results.append((total / count).astype(np.float32))
+            else:
+                results.append(error or ValueError("No frames could be read from the uploaded clip"))
+
+        return results
+
+
+
+    @staticmethod
+    def _accumulate(embeddings, owners, sums, counts):
+
+        for owner, row in zip(owners, embeddings):
+            sums[owner] = row.astype(np.float64) if sums[owner] is None else sums[owner] + row
+            counts[owner] += 1
+
+
+
+    async def _spool(self, upload):
+
+        # OpenCV decodes from a path, so the clip is spooled to a private temp file for the decoder
+        await upload.seek(0)
+
+        fd, video_path = tempfile.mkstemp(suffix=".mp4")
+
+        loop = asyncio.get_running_loop()
+
+        try:
+            with os.fdopen(fd, "wb") as temp_file:
+                while chunk := await upload.read(UPLOAD_CHUNK_SIZE):
+                    await loop.run_in_executor(None, temp_file.write, chunk)
+
+        except Exception:
+            os.remove(video_path)
+            raise
+
+        return video_path
+
+
+
+    async def embed(self, upload):
+
+        video_path = await self._spool(upload)
+
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self._embed_file, video_path)
+
+
+
+    async def embed_many(self, uploads):
+
+        # one result per upload, an exception instance where that clip failed
+        spooled = await asyncio.gather(*(self._spool(upload) for upload in uploads), return_exceptions=True)
+
+        video_paths = [path for path in spooled if not isinstance(path, BaseException)]
+
+        embedded = iter(await asyncio.get_running_loop().run_in_executor(self.executor, self._embed_files, video_paths) if video_paths else [])
+
+        return [path if isinstance(path, BaseException) else next(embedded) for path in spooled]
+
+
+
+    async def aclose(self):
+
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,142 @@
+import time
+import asyncio
+import numpy as np
+from collections import Counter, deque
+
+
+class MicroBatcher:
+
+    # coalesces calls that arrive within max_wait into one handler call of at most max_size items
+
+    def __init__(self, handler, max_size, max_wait):
+
+        # handler: async, takes a list of items and returns one result (or exception instance) per item, in order
+        self.handler = handler
+
+        self.max_size = max(1, int(max_size))
+        self.max_wait = max(0.0, float(max_wait))
+
+        self.queue = None
+        self.task = None
+
+        # dispatch tasks are kept referenced until done, and every caller's future until it resolves,
+        # so close() can fail whatever is still queued or in flight instead of leaving callers waiting
+        self.dispatches = set()
+        self.futures = set()
+        self.closed = False
+
+        self.batch_sizes = Counter()
+        self.queue_delays = deque(maxlen=1000)
+        self.counters = {"batches": 0, "items": 0, "failed_batches": 0}
+
+
+
+    async def submit(self, item):
+
+        if self.closed:
+            raise RuntimeError("Batcher is closed")
+
+        # the queue and worker belong to whichever loop first uses the batcher
+        if self.task is None:
+            self.queue = asyncio.Queue()
+            self.task = asyncio.get_running_loop().create_task(self._collect())
+
+        future = asyncio.get_running_loop().create_future()
+
+        self.futures.add(future)
+        future.add_done_callback(self.futures.discard)
+
+        await self.queue.put((item, future, time.perf_counter()))
+
+        return await future
+
+
+
+    async def _collect(self):
+
+        loop = asyncio.get_running_loop()
+
+        while True:
+
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+
+            # whatever is already queued joins immediately, then wait out the rest of the window
+            while len(batch) < self.max_size:
+                if not self.queue.empty():
+                    batch.append(self.queue.get_nowait())
+                    continue
+
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            now = time.perf_counter()
+            self.queue_delays.extend(now - enqueued for _, _, enqueued in batch)
+            self.batch_sizes[len(batch)] += 1
+            self.counters["batches"] += 1
+            self.counters["items"] += len(batch)
+
+            # the next window opens while this batch runs
+            dispatch = loop.create_task(self._dispatch(batch))
+            self.dispatches.add(dispatch)
+            dispatch.add_done_callback(self.dispatches.discard)
+
+
+
+    async def _dispatch(self, batch):
+
+        try:
+            results = await self.handler([item for item, _, _ in batch])
+
+        except Exception as e:
+            self.counters["failed_batches"] += 1
+            results = [e] * len(batch)
+
+        for (_, future, _), result in zip(batch, results):
+            if future.done():
+                continue
+
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+
+    def stats(self):
+
+        delays_ms = np.array(self.queue_delays, dtype=np.float64) * 1000
+
+        return {
+            **self.counters,
+            "max_size": self.max_size,
+            "max_wait_ms": round(self.max_wait * 1000, 2),
+            "mean_batch_size": round(self.counters["items"] / self.counters["batches"], 2) if self.counters["batches"] else 0.0,
+            "batch_sizes": {str(size): count for size, count in sorted(self.batch_sizes.items())},
+            "p50_queue_ms": round(float(np.percentile(delays_ms, 50)), 3) if delays_ms.size else 0.0,
+            "p95_queue_ms": round(float(np.percentile(delays_ms, 95)), 3) if delays_ms.size else 0.0,
+            "max_queue_ms": round(float(delays_ms.max()), 3) if delays_ms.size else 0.0,
+        }
+
+
+
+    def close(self):
+
+        self.closed = True
+
+        if self.task is not None:
+            self.task.cancel()
+
+        for dispatch in list(self.dispatches):
+            dispatch.cancel()
+
+        # queued, half-collected and in-flight calls all fail now rather than hang through shutdown
+        for future in list(self.futures):
+            if not future.done():
+                future.set_exception(RuntimeError("Batcher closed before the call completed"))
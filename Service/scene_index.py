@@ -0,0 +1,190 @@
+import os
+import shutil
+import numpy as np
+from Service.vector_index import NumpyVectorIndex, distances_from_scores
+
+
+class SceneIndex:
+
+    # many scene vectors per movie: score every scene, keep each movie's best one (max-sim), rank movies by it
+
+    def __init__(self, path, compact=None, rerank=None):
+
+        # float32 by default: compact codes only pay off once widening them is cheaper than reading float32
+        self.scenes = NumpyVectorIndex(path, compact=compact or os.getenv("SCENE_COMPACT", "none"), rerank=rerank)
+
+        self.path = self.scenes.path
+        self.count = self.scenes.count
+
+        # movies shortlisted on compact scores before their best scenes are re-scored in float32
+        self.rerank = int(rerank or os.getenv("SCENE_RERANK_MOVIES", 50))
+
+        metadatas = self.scenes.metadatas
+
+        self.starts = np.array([m["start"] for m in metadatas], dtype=np.float32)
+        self.ends = np.array([m["end"] for m in metadatas], dtype=np.float32)
+
+        movies, codes = np.unique([m["tconst"] for m in metadatas], return_inverse=True)
+        self.movies = movies.tolist()
+        self.movie_index = {tconst: i for i, tconst in enumerate(self.movies)}
+
+        # export_collection stores scene rows grouped by movie, so a reduceat straight over the scores gives every
+        # movie's max; an export written before that needs its scores permuted on every query
+        grouped = len(codes) < 2 or bool(np.all(np.diff(codes) >= 0))
+        self.order = None if grouped else np.argsort(codes, kind="stable")
+
+        grouped_codes = codes if self.order is None else codes[self.order]
+        self.group_starts = np.searchsorted(grouped_codes, np.arange(len(self.movies)))
+        self.group_sizes = np.diff(np.append(self.group_starts, len(grouped_codes)))
+        self.max_group = int(self.group_sizes.max()) if len(self.movies) else 0
+
+        first_scene = self.rows(self.group_starts) if len(self.movies) else []
+        self.filenames = [metadatas[i].get("filename") for i in first_scene]
+
+
+
+    @classmethod
+    def export_collection(cls, collection, path, compact=None, rerank=None):
+
+        compact = compact or os.getenv("SCENE_COMPACT", "none")
+
+        # the collection pages out in insertion order; one regrouping pass here saves a permute on every query
+        raw = path.with_name(f"{path.name}.{os.getpid()}.raw")
+        flat = NumpyVectorIndex.export_collection(collection, raw, compact="none")
+
+        order = np.argsort([m["tconst"] for m in flat.metadatas], kind="stable")
+
+        NumpyVectorIndex.build(path, [flat.ids[i] for i in order], flat.vectors[order],
+                               documents=[flat.documents[i] for i in order], metadatas=[flat.metadatas[i] for i in order],
+                               space=flat.space, compact=compact)
+
+        del flat
+        shutil.rmtree(raw, ignore_errors=True)
+
+        return cls(path, compact=compact, rerank=rerank)
+
+
+
+    def rows(self, positions):
+
+        # grouped positions back to stored rows
+        return positions if self.order is None else self.order[positions]
+
+
+
+    def best_positions(self, scores, shortlist):
+
+        # each shortlisted movie's best scene from a (Q, S, max_group) window over its group, never a full pass;
+        # positions past a short group's end repeat its last scene, which leaves the argmax unchanged
+        starts = self.group_starts[shortlist]
+        sizes = self.group_sizes[shortlist]
+
+        window = starts[..., None] + np.minimum(np.arange(self.max_group), sizes[..., None] - 1)
+
+        window_scores = np.take_along_axis(scores, window.reshape(len(scores), -1), axis=1).reshape(window.shape)
+
+        return np.take_along_axis(window, window_scores.argmax(axis=2)[..., None], axis=2)[..., 0]
+
+
+
+    def candidate_scores(self, queries, candidates):
+
+        # max-sim over the union of the batch's shortlisted movies: their grouped scene rows gathered into one
+        # flat run and scored in a single pass, every query sees every shortlisted movie
+        wanted = dict.fromkeys(t for shortlist in candidates for t in shortlist if t in self.movie_index)
+        movies = np.array([self.movie_index[t] for t in wanted], dtype=np.int64)
+
+        if len(movies) == 0:
+            return movies, None, None
+
+        sizes = self.group_sizes[movies]
+
+        # past half the rows, gathering costs more than the plain scan, which is exact anyway
+        if sizes.sum() * 2 > self.count:
+            return None
+
+        offsets = np.cumsum(sizes) - sizes
+
+        positions = np.repeat(self.group_starts[movies] - offsets, sizes) + np.arange(sizes.sum())
+        rows = self.rows(positions)
+
+        scores = self.scenes._metric((self.scenes.vectors[rows] @ queries.T).T, self.scenes.sq_norms[rows])
+
+        movie_scores = np.maximum.reduceat(scores, offsets, axis=1)
+
+        # first position holding its group's max, for the scene timestamps
+        is_best = scores == np.repeat(movie_scores, sizes, axis=1)
+        best = np.minimum.reduceat(np.where(is_best, np.arange(len(rows)), len(rows)), offsets, axis=1)
+
+        return movies, rows[best], movie_scores
+
+
+
+    def query(self, query_embeddings, n_results, candidates=None):
+
+        # candidates: per query, the tconsts of a trailer-level shortlist; only their scenes are scored, which keeps
+        # latency near the trailer search instead of scanning every scene
+        if self.count == 0:
+            return self._empty(len(query_embeddings))
+
+        queries = self.scenes.prepare(query_embeddings)
+
+        shortlisted = None if candidates is None else self.candidate_scores(queries, candidates)
+
+        if shortlisted is not None:
+            movies, scenes, movie_scores = shortlisted
+
+            if len(movies) == 0:
+                return self._empty(len(query_embeddings))
+
+            picks, picked_scores = NumpyVectorIndex._select(movie_scores, min(n_results, len(movies)))
+
+            return self._format(movies[picks], np.take_along_axis(scenes, picks, axis=1), picked_scores, queries)
+
+        scores = self.scenes.scores(queries)
+        if self.order is not None:
+            scores = scores[:, self.order]
+
+        movie_scores = np.maximum.reduceat(scores, self.group_starts, axis=1)
+
+        k = min(n_results, len(self.movies))
+
+        if self.scenes.codes is None:
+            # float32 scores are already exact, the top k movies are the answer
+            movies, picked_scores = NumpyVectorIndex._select(movie_scores, k)
+            scenes = self.rows(self.best_positions(scores, movies))
+
+        else:
+            shortlist, _ = NumpyVectorIndex._select(movie_scores, min(max(self.rerank, k), len(self.movies)))
+
+            # one float32 pass over just the shortlisted movies' best scenes
+            best = self.rows(self.best_positions(scores, shortlist))
+
+            picks, picked_scores = NumpyVectorIndex._select(self.scenes.exact_scores(best, queries), k)
+
+            movies = np.take_along_axis(shortlist, picks, axis=1)
+            scenes = np.take_along_axis(best, picks, axis=1)
+
+        return self._format(movies, scenes, picked_scores, queries)
+
+
+
+    @staticmethod
+    def _empty(count):
+
+        empty = [[] for _ in range(count)]
+        return {"ids": empty, "documents": empty, "metadatas": empty, "distances": empty, "start_times": empty, "end_times": empty}
+
+
+
+    def _format(self, movies, scenes, scores, queries):
+
+        # shaped like collection.query, with each hit's best scene as start/end times
+        return {
+            "ids": [[self.movies[m] for m in row] for row in movies],
+            "documents": [[f"Trailer for {self.movies[m]}" for m in row] for row in movies],
+            "metadatas": [[{"filename": self.filenames[m]} for m in row] for row in movies],
+            "distances": distances_from_scores(scores, self.scenes.space, queries).tolist(),
+            "start_times": self.starts[scenes].tolist(),
+            "end_times": self.ends[scenes].tolist(),
+        }
@@ -0,0 +1,158 @@
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# rough per-entry bookkeeping cost on top of the payload itself
+ENTRY_OVERHEAD = 256
+
+
+class SearchCache:
+
+    def __init__(self, max_bytes = None, ttl = None):
+
+        self.max_bytes = int(max_bytes or float(os.getenv("SEARCH_CACHE_MAX_MB", 64)) * 1024 * 1024)
+
+        self.ttl = float(ttl or os.getenv("SEARCH_CACHE_TTL", 3600))
+
+        # one LRU across both levels so the memory cap covers everything the cache holds
+        self.entries = OrderedDict()
+
+        self.current_bytes = 0
+
+        self.lock = threading.Lock()
+
+        self.counters = {
+            "embedding_hits": 0,
+            "embedding_misses": 0,
+            "result_hits": 0,
+            "result_misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0,
+        }
+
+
+
+    async def hash_upload(self, upload):
+
+        digest = hashlib.blake2b(digest_size=20)
+
+        await upload.seek(0)
+
+        while chunk := await upload.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+
+        await upload.seek(0)
+
+        return digest.hexdigest()
+
+
+
+    def vector_key(self, vector):
+
+        return hashlib.blake2b(vector.tobytes(), digest_size=20).hexdigest()
+
+
+
+    def _get(self, key, level):
+
+        with self.lock:
+            entry = self.entries.get(key)
+
+            if entry is not None and entry[0] < time.monotonic():
+                self._remove(key)
+                self.counters["expirations"] += 1
+                entry = None
+
+            if entry is None:
+                self.counters[f"{level}_misses"] += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.counters[f"{level}_hits"] += 1
+
+            return entry[2]
+
+
+
+    def _put(self, key, value, size):
+
+        size += ENTRY_OVERHEAD
+
+        if size > self.max_bytes:
+            return
+
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+
+            self.entries[key] = (time.monotonic() + self.ttl, size, value)
+            self.current_bytes += size
+
+            while self.current_bytes > self.max_bytes:
+                oldest = next(iter(self.entries))
+                self._remove(oldest)
+                self.counters["evictions"] += 1
+
+
+
+    def _remove(self, key):
+
+        _, size, _ = self.entries.pop(key)
+        self.current_bytes -= size
+
+
+
+    def get_embedding(self, clip_hash):
+
+        return self._get(("embedding", clip_hash), "embedding")
+
+
+
+    def put_embedding(self, clip_hash, vector):
+
+        vector.setflags(write=False)
+
+        self._put(("embedding", clip_hash), vector, vector.nbytes)
+
+
+
+    def get_results(self, vector_hash, top_k):
+
+        results = self._get(("results", vector_hash, top_k), "result")
+
+        return list(results) if results is not None else None
+
+
+
+    def put_results(self, vector_hash, top_k, results):
+
+        size = sum(len(r.id) + len(r.document) + len(str(r.metadata)) + 8 for r in results)
+
+        self._put(("results", vector_hash, top_k), tuple(results), size)
+
+
+
+    def clear(self):
+
+        with self.lock:
+            self.entries.clear()
+            self.current_bytes = 0
+            self.counters["invalidations"] += 1
+
+
+
+    def stats(self):
+
+        with self.lock:
+            return {
+                **self.counters,
+                "entries": len(self.entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+            }
@@ -0,0 +1,185 @@
+import os
+import sys
+import json
+import time
+import shutil
+import sqlite3
+import itertools
+from pathlib import Path
+from datetime import datetime
+
+MANIFEST_NAME = "snapshot.json"
+
+# bookkeeping DbManager keeps next to a legacy, unversioned DB, and the rebuildable numpy exports
+SKIP_NAMES = {"versions", "downloads", "CURRENT", "CURRENT.tmp", "numpy_index", "scene_index"}
+
+SQLITE_SIDE_FILES = (".sqlite3-wal", ".sqlite3-shm", ".sqlite3-journal")
+
+class SnapshotManager:
+
+    # incremental snapshots: files unchanged since the previous snapshot are hard links to it, changed ones are copied
+
+    def __init__(self, snapshot_dir, keep=None, keep_days=None):
+        self.snapshot_dir = Path(snapshot_dir)
+        self.keep = int(keep or os.getenv("SNAPSHOT_KEEP", 5))
+        self.keep_days = float(keep_days or os.getenv("SNAPSHOT_KEEP_DAYS", 0))
+
+    def list_snapshots(self):
+        if not self.snapshot_dir.exists():
+            return []
+        return sorted(p.name for p in self.snapshot_dir.iterdir() if (p / MANIFEST_NAME).exists())
+
+    def read_manifest(self, name):
+        with open(self.snapshot_dir / name / MANIFEST_NAME) as f:
+            return json.load(f)
+
+    def _source_files(self, source):
+        for root, dirs, files in os.walk(source):
+            if Path(root) == source:
+                dirs[:] = [d for d in dirs if d not in SKIP_NAMES]
+                files = [f for f in files if f not in SKIP_NAMES]
+
+            for name in files:
+                # sqlite journals are folded into the backup-API copy of their database
+                if name.endswith(SQLITE_SIDE_FILES):
+                    continue
+
+                path = Path(root) / name
+                yield path.relative_to(source).as_posix(), path
+
+    def _copy_file(self, src, dst):
+        # a live sqlite file may be mid-write, the backup API gives a consistent copy
+        if src.suffix == ".sqlite3":
+            source = sqlite3.connect(f"file:{src}?mode=ro", uri=True)
+            target = sqlite3.connect(dst)
+            try:
+                source.backup(target)
+            finally:
+                source.close()
+                target.close()
+        else:
+            shutil.copy2(src, dst)
+
+    def _reserve(self):
+        # names still sort by time; creating the staging directory claims one, so two snapshots in the same
+        # instant, or from two processes, take the next counter value instead of wiping each other's staging
+        stamp = f"{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_{os.getpid()}"
+
+        for attempt in itertools.count():
+            name = f"{stamp}_{attempt}"
+            staging = self.snapshot_dir / f"{name}.tmp"
+
+            if (self.snapshot_dir / name).exists():
+                continue
+
+            try:
+                staging.mkdir()
+            except FileExistsError:
+                continue
+
+            return name, staging
+
+    def create(self, source):
+        source = Path(source)
+        if not source.exists():
+            return None
+
+        self.snapshot_dir.mkdir(parents=True, exist_ok=True)
+
+        name, staging = self._reserve()
+
+        # links only ever point into the previous snapshot, never at the live files that keep changing
+        previous = self.list_snapshots()
+        previous_files = self.read_manifest(previous[-1])["files"] if previous else {}
+        previous_dir = self.snapshot_dir / previous[-1] if previous else None
+
+        files = {}
+        stats = {"linked": 0, "copied": 0, "bytes_copied": 0}
+
+        for rel, path in self._source_files(source):
+            st = path.stat()
+            entry = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+            # writes still sitting in the WAL change the database without touching its own mtime
+            wal = path.with_name(f"{path.name}-wal")
+            if wal.exists():
+                entry["wal_mtime_ns"] = wal.stat().st_mtime_ns
+
+            target = staging / rel
+            target.parent.mkdir(parents=True, exist_ok=True)
+
+            if previous_files.get(rel) == entry:
+                try:
+                    os.link(previous_dir / rel, target)
+                    stats["linked"] += 1
+                    files[rel] = entry
+                    continue
+                except OSError:
+                    pass
+
+            self._copy_file(path, target)
+            stats["copied"] += 1
+            stats["bytes_copied"] += st.st_size
+            files[rel] = entry
+
+        with open(staging / MANIFEST_NAME, "w") as f:
+            json.dump({"source": str(source), "created_at": time.time(), "files": files, "stats": stats}, f, indent=1)
+
+        os.replace(staging, self.snapshot_dir / name)
+
+        print(f"📁 Snapshot {name}: {stats['linked']} files linked, {stats['copied']} copied ({stats['bytes_copied'] / 1e6:.1f} MB)")
+
+        self.prune()
+        return name
+
+    def prune(self):
+        snapshots = self.list_snapshots()
+        cutoff = time.time() - self.keep_days * 24 * 60 * 60
+
+        # keep the newest N, plus anything younger than keep_days when that is set
+        for name in snapshots[:max(0, len(snapshots) - self.keep)]:
+            if self.keep_days and self.read_manifest(name)["created_at"] >= cutoff:
+                continue
+
+            # removing one snapshot only drops link counts, newer snapshots sharing its files keep them
+            shutil.rmtree(self.snapshot_dir / name, ignore_errors=True)
+            print(f"🧹 Removed snapshot {name}")
+
+    def materialize(self, name, target):
+        # restored DBs get written to again, so they get their own files instead of links into the snapshot
+        target = Path(target)
+        staging = target.with_name(f"{target.name}.tmp")
+        shutil.rmtree(staging, ignore_errors=True)
+
+        shutil.copytree(self.snapshot_dir / name, staging, ignore=shutil.ignore_patterns(MANIFEST_NAME))
+        os.replace(staging, target)
+
+        return target
+
+
+if __name__ == "__main__":
+
+    # usage: python -m Service.snapshot_manager [create | list | prune | restore <name>]
+    from dotenv import load_dotenv
+    from Service.db_manager import get_db_manager
+
+    load_dotenv()
+    dbManager = get_db_manager()
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "list"
+
+    if command == "create":
+        dbManager.backup_current_db()
+
+    elif command == "list":
+        for name in dbManager.snapshots.list_snapshots():
+            print(name, dbManager.snapshots.read_manifest(name)["stats"])
+
+    elif command == "prune":
+        dbManager.snapshots.prune()
+
+    elif command == "restore" and len(sys.argv) == 3:
+        dbManager.restore_snapshot(sys.argv[2])
+
+    else:
+        sys.exit("usage: python -m Service.snapshot_manager [create | list | prune | restore <name>]")
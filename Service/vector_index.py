@@ -0,0 +1,369 @@
+import os
+import json
+import time
+import shutil
+import numpy as np
+from pathlib import Path
+
+EXPORT_PAGE_SIZE = 1000
+
+VECTORS_FILE = "vectors.npy"
+NORMS_FILE = "sq_norms.npy"
+SIDECAR_FILE = "index.json"
+
+COMPACT_FILES = {"float16": "vectors_float16.npy", "int8": "vectors_int8.npy"}
+INT8_SCALES_FILE = "scales_int8.npy"
+
+# export-time passes (quantizing, norms) read the matrix this many rows at a time
+SCORE_CHUNK_ROWS = 65536
+
+# at query time compact codes are widened to float32 this many rows at a time: 4096 x 512 x 4 bytes is an 8 MB
+# scratch buffer per query thread, small next to the codes themselves and small enough to stay in cache
+QUERY_CHUNK_ROWS = int(os.getenv("SEARCH_SCORE_CHUNK_ROWS", 4096))
+
+
+def quantize_int8(vectors):
+
+    # symmetric per-dimension scales: each column uses the full [-127, 127] range
+    scales = np.zeros(vectors.shape[1], dtype=np.float32)
+    for start in range(0, len(vectors), SCORE_CHUNK_ROWS):
+        scales = np.maximum(scales, np.abs(vectors[start:start + SCORE_CHUNK_ROWS]).max(axis=0))
+
+    scales = np.where(scales > 0, scales / 127.0, 1.0).astype(np.float32)
+
+    codes = np.empty(vectors.shape, dtype=np.int8)
+    for start in range(0, len(vectors), SCORE_CHUNK_ROWS):
+        chunk = vectors[start:start + SCORE_CHUNK_ROWS] / scales
+        codes[start:start + SCORE_CHUNK_ROWS] = np.clip(np.rint(chunk), -127, 127)
+
+    return codes, scales
+
+
+def squared_norms(vectors):
+
+    sq_norms = np.empty(len(vectors), dtype=np.float32)
+    for start in range(0, len(vectors), SCORE_CHUNK_ROWS):
+        chunk = np.asarray(vectors[start:start + SCORE_CHUNK_ROWS], dtype=np.float64)
+        sq_norms[start:start + len(chunk)] = np.einsum("ij,ij->i", chunk, chunk)
+
+    return sq_norms
+
+
+def distances_from_scores(scores, space, queries):
+
+    # the distance Chroma reports for the same space, so SearchResult.distance means the same thing on both backends;
+    # l2 scores are ||q||^2 - d, the squared L2 distance d minus the per-query constant
+    if space == "l2":
+        return np.maximum(0.0, np.einsum("qd,qd->q", queries, queries)[:, None] - scores)
+
+    return 1.0 - scores
+
+
+class NumpyVectorIndex:
+
+    # exact search: one float32 (N, D) matrix, memory-mapped read-only so every worker shares the same pages
+
+    def __init__(self, path, compact=None, rerank=None):
+
+        self.path = Path(path)
+
+        with open(self.path / SIDECAR_FILE) as f:
+            sidecar = json.load(f)
+
+        self.ids = sidecar["ids"]
+        self.documents = sidecar["documents"]
+        self.metadatas = sidecar["metadatas"]
+        self.space = sidecar["space"]
+        self.count = sidecar["count"]
+
+        self.vectors = np.load(self.path / VECTORS_FILE, mmap_mode="r")
+
+        # stored vectors are pooled frame means and not unit length, so l2 and cosine need every row's norm
+        self.sq_norms = self._load_norms() if self.count else np.zeros(0, dtype=np.float32)
+
+        # "float16" or "int8" keeps only the compact codes resident, the float32 map is read just for re-ranking
+        self.compact = (compact or os.getenv("SEARCH_COMPACT", "none")).lower()
+
+        if self.compact != "none" and self.compact not in COMPACT_FILES:
+            raise ValueError(f"Unknown SEARCH_COMPACT: {self.compact}")
+
+        self.rerank = int(rerank or os.getenv("SEARCH_RERANK_CANDIDATES", 100))
+
+        self.codes, self.scales = self._load_compact() if self.compact != "none" and self.count else (None, None)
+
+
+
+    def _load_norms(self):
+
+        norms_path = self.path / NORMS_FILE
+
+        # exports written before the norms were saved get them on first load
+        if not norms_path.exists():
+            self._save_atomic(norms_path, squared_norms(self.vectors))
+
+        return np.load(norms_path, mmap_mode="r")
+
+
+
+    def _load_compact(self):
+
+        codes_path = self.path / COMPACT_FILES[self.compact]
+
+        if not codes_path.exists():
+            if self.compact == "int8":
+                codes, scales = quantize_int8(self.vectors)
+                self._save_atomic(self.path / INT8_SCALES_FILE, scales)
+            else:
+                codes = np.empty(self.vectors.shape, dtype=np.float16)
+                for start in range(0, self.count, SCORE_CHUNK_ROWS):
+                    codes[start:start + SCORE_CHUNK_ROWS] = self.vectors[start:start + SCORE_CHUNK_ROWS]
+
+            self._save_atomic(codes_path, codes)
+
+        # mapped like the float32 matrix, so W uvicorn workers share one copy of the codes in the page cache
+        codes = np.load(codes_path, mmap_mode="r")
+        scales = np.load(self.path / INT8_SCALES_FILE, mmap_mode="r") if self.compact == "int8" else None
+
+        return codes, scales
+
+
+
+    @staticmethod
+    def _save_atomic(path, array):
+
+        tmp = path.with_name(f"{path.stem}.{os.getpid()}.tmp.npy")
+        np.save(tmp, array)
+        os.replace(tmp, path)
+
+
+
+    def memory_split(self):
+
+        # (shared, per-worker) bytes a search keeps resident: the compact codes, or the whole float32 matrix without
+        # them; memory-mapped arrays sit in the page cache once for every worker, loaded ones are paid per process
+        arrays = [self.codes, self.scales, self.sq_norms] if self.codes is not None else [self.vectors, self.sq_norms]
+        arrays = [a for a in arrays if a is not None]
+
+        shared = sum(a.nbytes for a in arrays if isinstance(a, np.memmap))
+
+        return shared, sum(a.nbytes for a in arrays) - shared
+
+
+
+    def memory_bytes(self, workers=1):
+
+        shared, per_worker = self.memory_split()
+
+        return shared + workers * per_worker
+
+
+
+    @classmethod
+    def build(cls, path, ids, vectors, documents=None, metadatas=None, space="l2", **options):
+
+        path = Path(path)
+        staging = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        shutil.rmtree(staging, ignore_errors=True)
+        staging.mkdir(parents=True)
+
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        np.save(staging / VECTORS_FILE, vectors)
+        np.save(staging / NORMS_FILE, squared_norms(vectors))
+
+        cls._write_sidecar(staging, ids, documents, metadatas, space)
+
+        return cls._publish(staging, path, **options)
+
+
+
+    @classmethod
+    def export_collection(cls, collection, path, **options):
+
+        path = Path(path)
+        staging = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        shutil.rmtree(staging, ignore_errors=True)
+        staging.mkdir(parents=True)
+
+        count = collection.count()
+        space = (collection.metadata or {}).get("hnsw:space", "l2")
+
+        ids, documents, metadatas = [], [], []
+        matrix = None
+
+        # paged straight into the memory map, the collection never sits in RAM twice
+        for offset in range(0, count, EXPORT_PAGE_SIZE):
+            page = collection.get(limit=EXPORT_PAGE_SIZE, offset=offset, include=["embeddings", "documents", "metadatas"])
+
+            embeddings = np.asarray(page["embeddings"], dtype=np.float32)
+
+            if matrix is None:
+                matrix = np.lib.format.open_memmap(staging / VECTORS_FILE, mode="w+", dtype=np.float32, shape=(count, embeddings.shape[1]))
+
+            matrix[len(ids):len(ids) + len(embeddings)] = embeddings
+
+            ids.extend(page["ids"])
+            documents.extend(page["documents"])
+            metadatas.extend(page["metadatas"])
+
+        if matrix is None:
+            np.save(staging / VECTORS_FILE, np.zeros((0, 0), dtype=np.float32))
+        else:
+            matrix.flush()
+            np.save(staging / NORMS_FILE, squared_norms(matrix))
+            del matrix
+
+        cls._write_sidecar(staging, ids, documents, metadatas, space)
+
+        return cls._publish(staging, path, **options)
+
+
+
+    @staticmethod
+    def _write_sidecar(staging, ids, documents, metadatas, space):
+
+        sidecar = {
+            "ids": list(ids),
+            "documents": list(documents) if documents is not None else [None] * len(ids),
+            "metadatas": list(metadatas) if metadatas is not None else [None] * len(ids),
+            "space": space,
+            "count": len(ids),
+            "exported_at": time.time(),
+        }
+
+        with open(staging / SIDECAR_FILE, "w") as f:
+            json.dump(sidecar, f)
+
+
+
+    @classmethod
+    def _publish(cls, staging, path, **options):
+
+        # several uvicorn workers may export at once, whichever rename lands first is the one everybody maps
+        try:
+            os.replace(staging, path)
+        except OSError:
+            shutil.rmtree(staging, ignore_errors=True)
+
+        return cls(path, **options)
+
+
+
+    @staticmethod
+    def _select(scores, k):
+
+        # argpartition so only the k winners per row get sorted
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+
+        order = np.argsort(-candidate_scores, axis=1)
+
+        return np.take_along_axis(candidates, order, axis=1), np.take_along_axis(candidate_scores, order, axis=1)
+
+
+
+    def _compact_scores(self, queries):
+
+        # int8: q . (codes * scales) == (q * scales) . codes, so the scales fold into the query once
+        weights = queries * self.scales if self.scales is not None else queries
+
+        scores = np.empty((len(queries), self.count), dtype=np.float32)
+
+        # one scratch buffer reused for every chunk instead of a fresh astype copy each time
+        scratch = np.empty((min(QUERY_CHUNK_ROWS, self.count), self.codes.shape[1]), dtype=np.float32)
+
+        for start in range(0, self.count, QUERY_CHUNK_ROWS):
+            chunk = self.codes[start:start + QUERY_CHUNK_ROWS]
+            widened = scratch[:len(chunk)]
+            widened[...] = chunk
+            scores[:, start:start + len(chunk)] = weights @ widened.T
+
+        return scores
+
+
+
+    def scratch_bytes(self, queries=1):
+
+        # per-query temporaries: the (Q, N) score row, plus the widening buffer when scoring compact codes
+        scratch = min(QUERY_CHUNK_ROWS, self.count) * self.vectors.shape[1] * 4 if self.codes is not None else 0
+
+        return queries * self.count * 4 + scratch
+
+
+
+    def prepare(self, query_embeddings):
+
+        queries = np.asarray(query_embeddings, dtype=np.float32).reshape(-1, self.vectors.shape[1])
+
+        if self.space == "cosine":
+            queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+
+        return queries
+
+
+
+    def _metric(self, dots, sq_norms):
+
+        # dot products to scores that rank like the collection's distance, higher is closer:
+        # l2 2q.v - ||v||^2, cosine q.v / ||v|| (queries already unit length), ip q.v
+        if self.space == "l2":
+            return 2.0 * dots - sq_norms
+
+        if self.space == "cosine":
+            return dots / np.sqrt(np.maximum(sq_norms, 1e-24))
+
+        return dots
+
+
+
+    def scores(self, queries):
+
+        # (Q, N) scores against every row, approximate when only compact codes are resident
+        dots = self._compact_scores(queries) if self.codes is not None else queries @ self.vectors.T
+
+        return self._metric(dots, self.sq_norms)
+
+
+
+    def exact_scores(self, rows, queries):
+
+        # float32 re-score of selected rows: rows is (Q, K), one candidate list per query
+        return self._metric(np.einsum("qkd,qd->qk", self.vectors[rows], queries), self.sq_norms[rows])
+
+
+
+    def top_k(self, queries, top_k):
+
+        k = min(top_k, self.count)
+
+        if self.codes is None:
+            return self._select(self.scores(queries), k)
+
+        # shortlist on the compact codes, then re-score only the shortlist against the float32 vectors
+        candidates, _ = self._select(self.scores(queries), min(max(self.rerank, k), self.count))
+
+        exact = self.exact_scores(candidates, queries)
+
+        rows, scores = self._select(exact, k)
+
+        return np.take_along_axis(candidates, rows, axis=1), scores
+
+
+
+    def query(self, query_embeddings, n_results):
+
+        if self.count == 0:
+            empty = [[] for _ in query_embeddings]
+            return {"ids": empty, "documents": empty, "metadatas": empty, "distances": empty}
+
+        queries = self.prepare(query_embeddings)
+
+        rows, scores = self.top_k(queries, n_results)
+        distances = distances_from_scores(scores, self.space, queries)
+
+        # shaped like collection.query, so format_results works on either backend
+        return {
+            "ids": [[self.ids[i] for i in row] for row in rows],
+            "documents": [[self.documents[i] for i in row] for row in rows],
+            "metadatas": [[self.metadatas[i] for i in row] for row in rows],
+            "distances": distances.tolist(),
+        }
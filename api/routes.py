@@ -1,58 +1,121 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Form
+from fastapi import APIRouter, UploadFile, File, HTTPException, Form, Depends
 from Service.TrailerSearchService import TrailerSearchService
-from models.response_model import SearchResult
-from Service.db_manager import dbManager
-from pathlib import Path
-import datetime
-import shutil
+from models.response_model import SearchResult, BatchSearchItem
+from Service.db_manager import get_db_manager
+import asyncio
 import os
 
 router = APIRouter()
-search_service = TrailerSearchService()
 
-parent_dir = Path(__file__).resolve().parent.parent
+# built by the app lifespan, off the event loop, so importing the app never opens the index
+search_service = None
+startup_error = None
 
-CHROMA_DB_PATH = parent_dir / "chroma_db"
+SEARCH_BATCH_MAX_FILES = int(os.getenv("SEARCH_BATCH_MAX_FILES", 64))
 
-@router.post("/search", response_model=list[SearchResult])
-async def search_scene(file: UploadFile = File(...), top_k: int = Form(3)):
+
+async def start_search_service():
+    global search_service, startup_error
 
     try:
+        # opening the collection and the warm-up query are blocking
+        service = await asyncio.get_running_loop().run_in_executor(None, TrailerSearchService)
+
+    except Exception as e:
+        startup_error = str(e)
+        print(f"❌ Search service failed to start: {e}")
+        return
+
+    service.start_index_watcher()
+    get_db_manager().add_update_listener(service.on_index_updated)
+
+    search_service = service
+    print(f"✅ Search service ready, serving {service.index.version or service.index.db_path} ({service.index.vector_count} vectors)")
 
-        temp_dir = "client_uploads"
 
-        os.makedirs(temp_dir, exist_ok=True)
-        
-        temp_file_path = os.path.join(temp_dir, file.filename)
+async def stop_search_service():
+    if search_service is not None:
+        await search_service.aclose()
 
-        with open(temp_file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
 
-        raw_results = search_service.search(temp_file_path, top_k=top_k)
+def get_search_service():
+    if search_service is None:
+        raise HTTPException(status_code=503, detail=startup_error or "Search index is still loading.")
+
+    return search_service
+
+
+@router.post("/search", response_model=list[SearchResult])
+async def search_scene(file: UploadFile = File(...), top_k: int = Form(3), service: TrailerSearchService = Depends(get_search_service)):
+
+    try:
+
+        raw_results = await service.search(file, top_k=top_k)
 
         return raw_results
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    
-    finally:
-        if os.path.exists(temp_file_path):
-            os.remove(temp_file_path)
+
+
+@router.post("/search/batch", response_model=list[BatchSearchItem])
+async def search_scene_batch(files: list[UploadFile] = File(...), top_k: int = Form(3), service: TrailerSearchService = Depends(get_search_service)):
+
+    if len(files) > SEARCH_BATCH_MAX_FILES:
+        raise HTTPException(status_code=413, detail=f"A batch can hold at most {SEARCH_BATCH_MAX_FILES} files.")
+
+    try:
+
+        return await service.search_batch(files, top_k=top_k)
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/search/cache/stats")
+def search_cache_stats(service: TrailerSearchService = Depends(get_search_service)):
+    return service.cache.stats()
+
+
+@router.get("/search/batching/stats")
+def search_batching_stats(service: TrailerSearchService = Depends(get_search_service)):
+    return service.batching_stats()
 
 
 @router.post("/update-chromadb")
 def update_chromadb():
     try:
-        #Backup old DB first
-        backup_path = f"{dbManager.CHROMA_DB_PATH}_backup_{datetime.now().strftime('%Y%m%d%H%M%S')}"
-        if dbManager.CHROMA_DB_PATH.exists():
-            shutil.copytree(dbManager.CHROMA_DB_PATH, backup_path)
-            print(f"🧾 Backup saved to {backup_path}")
+        # update_chromadb snapshots the current DB before it downloads the new one
+        version = get_db_manager().update_chromadb()
+
+        return {"status": "success", "message": "ChromaDB updated successfully.", "version": version}
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/update-chromadb/snapshots")
+def list_snapshots():
+    return get_db_manager().snapshots.list_snapshots()
+
+
+@router.post("/update-chromadb/restore")
+def restore_snapshot(name: str = Form(...)):
+    try:
+        version = get_db_manager().restore_snapshot(name)
+
+        return {"status": "success", "message": f"Snapshot {name} restored.", "version": version}
 
-        # Proceed with update
-        dbManager.update_chromadb()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/update-chromadb/rollback")
+def rollback_chromadb(version: str = Form(None)):
+    try:
+        version = get_db_manager().rollback(version)
 
-        return {"status": "success", "message": "ChromaDB updated successfully."}
+        return {"status": "success", "message": "ChromaDB rolled back.", "version": version}
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
@@ -0,0 +1,67 @@
+import sys
+import cv2
+import time
+from pathlib import Path
+from util.frame_sampler import FrameSampler
+
+# usage: python -m benchmarks.benchmark_frame_sampler [trailer.mp4 ...]
+
+parent_dir = Path(__file__).resolve().parent.parent
+
+
+def seek_based_frames(video_path, num_frames):
+
+    # the original extractFrames strategy: one cap.set() seek per sampled frame
+    cap = cv2.VideoCapture(str(video_path))
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+    if total_frames < num_frames:
+        frame_ids = list(range(total_frames))
+    else:
+        step = total_frames // num_frames
+        frame_ids = [i * step for i in range(num_frames)]
+
+    for frame_id in frame_ids:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_id)
+        success, frame = cap.read()
+        if success:
+            yield cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+    cap.release()
+
+
+def time_strategy(name, frame_iter_factory, videos):
+
+    frames = 0
+    start = time.perf_counter()
+
+    for video in videos:
+        for _ in frame_iter_factory(video):
+            frames += 1
+
+    elapsed = time.perf_counter() - start
+    print(f"{name:<24} {frames:>7} frames  {elapsed:>8.2f}s  {frames / elapsed if elapsed else 0:>9.1f} frames/sec")
+
+
+def run_benchmark(videos, num_frames=100):
+
+    sequential = FrameSampler(num_frames=num_frames, keyframes_only=False)
+
+    time_strategy("seek per frame", lambda v: seek_based_frames(v, num_frames), videos)
+    time_strategy("sequential grab/retrieve", lambda v: sequential.sample(v), videos)
+
+    try:
+        keyframes = FrameSampler(num_frames=num_frames, keyframes_only=True)
+        time_strategy("keyframes only", lambda v: keyframes.sample(v), videos)
+    except ImportError as e:
+        print(f"keyframes only           skipped: {e}")
+
+
+if __name__ == "__main__":
+
+    videos = sys.argv[1:] or sorted(str(p) for p in (parent_dir / "trailers").glob("*.mp4"))[:10]
+
+    if not videos:
+        sys.exit("No trailers to benchmark, pass .mp4 paths or fill trailers/")
+
+    run_benchmark(videos)
@@ -0,0 +1,69 @@
+import os
+import sys
+import time
+import tempfile
+import numpy as np
+from pathlib import Path
+from Service.vector_index import NumpyVectorIndex
+from benchmarks.benchmark_vector_search import QUERIES, TOP_K, pooled_catalog, scene_queries, squared_l2, exact_top_k
+
+# usage: python -m benchmarks.benchmark_quantized_search [catalog sizes ...]
+
+COMPACT_MODES = ("none", "float16", "int8")
+
+# uvicorn workers each mapping the same export
+WORKERS = int(os.getenv("BENCH_WORKERS", 4))
+
+
+def run_benchmark(sizes, rerank=None):
+
+    rng = np.random.default_rng(0)
+
+    print(f"{'size':>8} {'storage':<8} {'shared MB':>10} {'worker MB':>10} {'total MB x' + str(WORKERS):>12} {'scratch MB':>11} {'p50 ms':>8} {'p95 ms':>8} {'recall@' + str(TOP_K):>9} {'max |d - d32|':>14}")
+
+    for size in sizes:
+
+        themes, catalog = pooled_catalog(size, rng)
+        ids = [f"tt{i:08d}" for i in range(size)]
+
+        queries = scene_queries(themes, rng)
+
+        # recall against Chroma's l2 metric, distances against the float32 search
+        truth = exact_top_k(squared_l2(catalog, queries))
+
+        with tempfile.TemporaryDirectory() as tmp:
+
+            NumpyVectorIndex.build(Path(tmp) / "index", ids, catalog)
+
+            baseline = None
+
+            for mode in COMPACT_MODES:
+
+                index = NumpyVectorIndex(Path(tmp) / "index", compact=mode, rerank=rerank)
+
+                latencies, found, distances = [], [], []
+                for query in queries:
+                    start = time.perf_counter()
+                    result = index.query([query.tolist()], TOP_K)
+                    latencies.append((time.perf_counter() - start) * 1000)
+                    found.append(result["ids"][0])
+                    distances.append(result["distances"][0])
+
+                distances = np.array(distances)
+                baseline = distances if baseline is None else baseline
+
+                hits = sum(len(set(f) & {ids[i] for i in t}) for f, t in zip(found, truth))
+
+                shared, per_worker = index.memory_split()
+
+                print(f"{size:>8} {mode:<8} {shared / 1e6:>10.1f} {per_worker / 1e6:>10.1f} {index.memory_bytes(WORKERS) / 1e6:>12.1f} "
+                      f"{index.scratch_bytes() / 1e6:>11.1f} "
+                      f"{np.percentile(latencies, 50):>8.2f} "
+                      f"{np.percentile(latencies, 95):>8.2f} {hits / (QUERIES * TOP_K):>9.3f} {np.abs(distances - baseline).max():>14.2e}")
+
+
+if __name__ == "__main__":
+
+    sizes = [int(size) for size in sys.argv[1:]] or [10_000, 100_000, 500_000]
+
+    run_benchmark(sizes)
@@ -0,0 +1,99 @@
+import sys
+import time
+import tempfile
+import numpy as np
+from pathlib import Path
+from Service.vector_index import NumpyVectorIndex
+from Service.scene_index import SceneIndex
+from benchmarks.benchmark_vector_search import DIM, TOP_K, pooled_vectors, unit_vectors
+
+# usage: python -m benchmarks.benchmark_scene_search [movies] [scenes per movie] [queries per batch]
+
+BATCHES = 50
+
+# SCENE_CANDIDATE_MOVIES settings to compare
+CANDIDATES = (50, 200, 1000)
+
+
+def scene_catalog(themes, scenes_per_movie, rng):
+
+    # scenes of one movie scatter around its theme, stored grouped by movie the way SceneIndex.export_collection writes them
+    scenes = pooled_vectors(np.repeat(themes, scenes_per_movie, axis=0), 4, rng)
+    return scenes / np.linalg.norm(scenes, axis=1, keepdims=True)
+
+
+def time_batches(search, queries, batch):
+
+    latencies, ids = [], []
+    for start in range(0, len(queries), batch):
+        began = time.perf_counter()
+        result = search(queries[start:start + batch].tolist())
+        latencies.append((time.perf_counter() - began) * 1000)
+        ids.extend(result["ids"])
+
+    return np.percentile(latencies, 50), np.percentile(latencies, 95), ids
+
+
+
+def shortlisted(trailer_index, scene_index, candidates):
+
+    # the IndexHandle path: trailer-level shortlist first, then max-sim over only those movies' scenes
+    def search(queries):
+        shortlist = trailer_index.query(queries, max(candidates, TOP_K))
+        return scene_index.query(queries, TOP_K, candidates=shortlist["ids"])
+
+    return search
+
+
+
+def recall(ids, exact):
+
+    return np.mean([len(set(got) & set(want)) / len(want) for got, want in zip(ids, exact)])
+
+
+def run_benchmark(movies, scenes_per_movie, batch):
+
+    rng = np.random.default_rng(0)
+
+    themes = unit_vectors(movies, rng)
+    scenes = scene_catalog(themes, scenes_per_movie, rng)
+
+    # a trailer is pooled from the same frames as its scenes
+    trailers = scenes.reshape(movies, scenes_per_movie, DIM).mean(axis=1)
+
+    tconsts = [f"tt{i:08d}" for i in range(movies)]
+    scene_tconsts = np.repeat(tconsts, scenes_per_movie).tolist()
+    scene_ids = [f"{tconst}:{i % scenes_per_movie:04d}" for i, tconst in enumerate(scene_tconsts)]
+    scene_metadatas = [{"tconst": tconst, "start": float(i % scenes_per_movie), "end": float(i % scenes_per_movie + 1), "filename": None}
+                       for i, tconst in enumerate(scene_tconsts)]
+
+    # a query clip is a few frames of one scene
+    queries = pooled_vectors(scenes[rng.integers(0, len(scenes), BATCHES * batch)], 4, rng)
+
+    print(f"{movies} movies x {scenes_per_movie} scenes, {batch} queries per batch, dim {DIM}")
+    print(f"{'index':<22} {'rows':>9} {'p50 ms':>8} {'p95 ms':>8} {'x trailer':>10} {'recall':>7}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+
+        trailer_index = NumpyVectorIndex.build(Path(tmp) / "trailers", tconsts, trailers)
+        baseline, p95, _ = time_batches(lambda q: trailer_index.query(q, TOP_K), queries, batch)
+        print(f"{'trailer':<22} {movies:>9} {baseline:>8.2f} {p95:>8.2f} {1.0:>10.1f} {'-':>7}")
+
+        NumpyVectorIndex.build(Path(tmp) / "scenes", scene_ids, scenes, metadatas=scene_metadatas)
+        scene_index = SceneIndex(Path(tmp) / "scenes")
+
+        # the full scan is the exact answer the shortlisted runs are measured against
+        p50, p95, exact = time_batches(lambda q: scene_index.query(q, TOP_K), queries, batch)
+        print(f"{'scenes full scan':<22} {len(scene_ids):>9} {p50:>8.2f} {p95:>8.2f} {p50 / baseline:>10.1f} {1.0:>7.3f}")
+
+        for candidates in CANDIDATES:
+            p50, p95, ids = time_batches(shortlisted(trailer_index, scene_index, candidates), queries, batch)
+            rows = movies + min(candidates, movies) * scenes_per_movie
+            print(f"{f'scenes shortlist {candidates}':<22} {rows:>9} {p50:>8.2f} {p95:>8.2f} {p50 / baseline:>10.1f} {recall(ids, exact):>7.3f}")
+
+
+if __name__ == "__main__":
+
+    args = [int(arg) for arg in sys.argv[1:]]
+
+    run_benchmark(*(args + [5_000, 20, 2][len(args):]))
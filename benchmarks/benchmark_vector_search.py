@@ -0,0 +1,138 @@
+import sys
+import time
+import tempfile
+import numpy as np
+from pathlib import Path
+from Service.vector_index import NumpyVectorIndex
+
+# usage: python -m benchmarks.benchmark_vector_search [catalog sizes ...]
+
+DIM = 512
+QUERIES = 200
+TOP_K = 5
+CHROMA_ADD_BATCH = 5000
+TRAILER_FRAMES = 16
+SCENE_FRAMES = 4
+POOL_CHUNK = 1000
+
+
+def unit_vectors(count, rng):
+
+    vectors = rng.standard_normal((count, DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def pooled_vectors(themes, frames, rng):
+
+    # pooled the way ClipEmbedder.embed_frames pools: the plain mean of unit frame vectors, so norms vary per
+    # trailer with how much its frames differ
+    pooled = np.empty(themes.shape, dtype=np.float32)
+
+    for start in range(0, len(themes), POOL_CHUNK):
+        chunk = themes[start:start + POOL_CHUNK]
+        spread = rng.uniform(1.0, 4.0, (len(chunk), 1, 1)).astype(np.float32)
+
+        frame_vectors = chunk[:, None, :] + spread * rng.standard_normal((len(chunk), frames, DIM)).astype(np.float32) / np.sqrt(DIM)
+        frame_vectors /= np.linalg.norm(frame_vectors, axis=2, keepdims=True)
+
+        pooled[start:start + POOL_CHUNK] = frame_vectors.mean(axis=1)
+
+    return pooled
+
+
+def pooled_catalog(count, rng):
+
+    themes = unit_vectors(count, rng)
+    return themes, pooled_vectors(themes, TRAILER_FRAMES, rng)
+
+
+def scene_queries(themes, rng):
+
+    # a query clip is a few frames of one trailer, pooled the same way
+    return pooled_vectors(themes[rng.integers(0, len(themes), QUERIES)], SCENE_FRAMES, rng)
+
+
+def squared_l2(catalog, queries):
+
+    # Chroma's default "l2" space, the ground truth both backends are measured against
+    catalog = catalog.astype(np.float64)
+    queries = queries.astype(np.float64)
+
+    return (queries ** 2).sum(axis=1)[:, None] + (catalog ** 2).sum(axis=1) - 2.0 * queries @ catalog.T
+
+
+def exact_top_k(distances):
+
+    return np.argsort(distances, axis=1)[:, :TOP_K]
+
+
+def recall(found_ids, truth_rows, ids):
+
+    hits = sum(len(set(found) & {ids[i] for i in truth}) for found, truth in zip(found_ids, truth_rows))
+    return hits / (len(truth_rows) * TOP_K)
+
+
+def time_queries(query_fn, queries):
+
+    latencies = []
+    found = []
+    distances = []
+
+    for query in queries:
+        start = time.perf_counter()
+        result = query_fn([query.tolist()], TOP_K)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found.append(result["ids"][0])
+        distances.append(result["distances"][0][0])
+
+    latencies = np.array(latencies)
+    return found, distances, np.percentile(latencies, 50), np.percentile(latencies, 95)
+
+
+def distance_error(found, distances, truth_distances, id_rows):
+
+    # reported top-hit distance against the true squared L2 distance of that same row
+    return max(abs(d - truth_distances[q, id_rows[ids[0]]]) for q, (ids, d) in enumerate(zip(found, distances)))
+
+
+def run_benchmark(sizes):
+
+    # imported here so the catalog helpers above can be shared without chromadb installed
+    from chromadb import PersistentClient
+
+    rng = np.random.default_rng(0)
+
+    print(f"{'size':>8} {'backend':<8} {'p50 ms':>8} {'p95 ms':>8} {'recall@' + str(TOP_K):>9} {'max |d - d_true|':>17}")
+
+    for size in sizes:
+
+        themes, catalog = pooled_catalog(size, rng)
+        queries = scene_queries(themes, rng)
+        ids = [f"tt{i:08d}" for i in range(size)]
+        id_rows = {tconst: i for i, tconst in enumerate(ids)}
+
+        truth_distances = squared_l2(catalog, queries)
+        truth = exact_top_k(truth_distances)
+
+        with tempfile.TemporaryDirectory() as tmp:
+
+            collection = PersistentClient(path=str(Path(tmp) / "chroma")).get_or_create_collection("benchmark")
+            for start in range(0, size, CHROMA_ADD_BATCH):
+                collection.add(ids=ids[start:start + CHROMA_ADD_BATCH], embeddings=catalog[start:start + CHROMA_ADD_BATCH].tolist())
+
+            numpy_index = NumpyVectorIndex.build(Path(tmp) / "numpy_index", ids, catalog)
+
+            for name, query_fn in (
+                ("chroma", lambda q, k: collection.query(query_embeddings=q, n_results=k, include=["distances"])),
+                ("numpy", lambda q, k: numpy_index.query(q, k)),
+            ):
+                found, distances, p50, p95 = time_queries(query_fn, queries)
+                print(f"{size:>8} {name:<8} {p50:>8.2f} {p95:>8.2f} {recall(found, truth, ids):>9.3f} "
+                      f"{distance_error(found, distances, truth_distances, id_rows):>17.2e}")
+
+
+if __name__ == "__main__":
+
+    sizes = [int(size) for size in sys.argv[1:]] or [1_000, 10_000, 50_000, 100_000]
+
+    run_benchmark(sizes)
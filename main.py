@@ -1,7 +1,20 @@
+from api import routes
 from api.routes import router
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from Service.TrailerSearchService import TrailerSearchService
+from contextlib import asynccontextmanager
+import asyncio
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # the index opens and warms in the background; liveness answers at once, readiness once it is warm
+    startup = asyncio.create_task(routes.start_search_service())
+    yield
+    startup.cancel()
+    await routes.stop_search_service()
+
 
 app = FastAPI(
     title="Movie Identifier API",
@@ -13,6 +26,7 @@ app = FastAPI(
             "description": "Endpoints for identifying movie using scene.",
         },
     ],
+    lifespan=lifespan,
 )
 
 
@@ -26,14 +40,23 @@ app.add_middleware(
 
 app.include_router(router, prefix="/api/v1")
 
-app.get("/")
+@app.get("/")
 async def root():
     return {"message": "Welcome to the Movie Identifier python service. server is up and running."}
 
 @app.get("/health")
+@app.get("/health/live")
 async def health_check():
     return {"status": "healthy", "version": "1.0.0"}
 
+@app.get("/health/ready")
+async def readiness_check():
+    if routes.search_service is None:
+        status = "failed" if routes.startup_error else "starting"
+        return JSONResponse(status_code=503, content={"status": status, "detail": routes.startup_error, "warm": False})
+
+    return {"status": "ready", "version": "1.0.0", **routes.search_service.status()}
+
 
 # if __name__ == "__main__":
 #     import uvicorn
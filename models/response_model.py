@@ -1,8 +1,15 @@
 from pydantic import BaseModel
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 
 class SearchResult(BaseModel):
     id: str
     document: str
     metadata: Dict[str, Any]
     distance: float
+    start_time: Optional[float] = None
+    end_time: Optional[float] = None
+
+class BatchSearchItem(BaseModel):
+    filename: str
+    results: List[SearchResult] = []
+    error: Optional[str] = None
@@ -0,0 +1,273 @@
+import os
+import time
+import socket
+import sqlite3
+import threading
+from pathlib import Path
+from datetime import datetime
+
+
+parent_dir = Path(__file__).resolve().parent.parent
+
+path_checkpoints = parent_dir / "Data" / "ingestion_checkpoints.sqlite3"
+
+# item states that need no further work when a range is picked up again; "not found" answers
+# are retried, a failed request looks the same and the TMDb cache makes real misses cheap
+LOOKUP_FINISHED_STATES = ("trailer_found",)
+STREAMING_FINISHED_STATES = ("stored", "up_to_date")
+
+SQL_CHUNK_SIZE = 900
+
+
+def default_worker_id():
+
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class CheckpointStore:
+
+    def __init__(self, path=None, lease_seconds=None):
+
+        self.path = Path(path or os.getenv("CHECKPOINT_DB_PATH", path_checkpoints))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self.lease_seconds = float(lease_seconds or os.getenv("CHECKPOINT_LEASE_SECONDS", 1800))
+
+        # autocommit mode, every write below runs in an explicit transaction; shared by the worker's
+        # pipeline threads and its lease heartbeat, one statement or transaction at a time
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None, check_same_thread=False)
+
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS ranges (
+                start INTEGER PRIMARY KEY,
+                stop INTEGER NOT NULL,
+                status TEXT NOT NULL DEFAULT 'open',
+                worker TEXT,
+                lease_expires REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                updated_at TEXT
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS items (
+                tconst TEXT PRIMARY KEY,
+                range_start INTEGER,
+                status TEXT NOT NULL,
+                detail TEXT,
+                updated_at TEXT
+            )
+        """)
+
+
+
+    def _transaction(self):
+
+        # BEGIN IMMEDIATE takes the write lock up front, so two workers can never lease the same range
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+
+
+    def seed_ranges(self, total, range_size, start=0):
+
+        with self.lock:
+            self._transaction()
+            try:
+                for range_start in range(start, total, range_size):
+                    self.conn.execute(
+                        "INSERT OR IGNORE INTO ranges (start, stop, status, updated_at) VALUES (?, ?, 'open', ?)",
+                        (range_start, min(range_start + range_size, total), datetime.now().isoformat()),
+                    )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+
+
+    def lease_range(self, worker_id):
+
+        with self.lock:
+            # the next open range, or one whose worker stopped renewing its lease
+            now = time.time()
+
+            self._transaction()
+            try:
+                row = self.conn.execute("""
+                    SELECT start, stop FROM ranges
+                    WHERE status = 'open' OR (status = 'leased' AND lease_expires < ?)
+                    ORDER BY start LIMIT 1
+                """, (now,)).fetchone()
+
+                if row is not None:
+                    self.conn.execute("""
+                        UPDATE ranges SET status = 'leased', worker = ?, lease_expires = ?, attempts = attempts + 1, updated_at = ?
+                        WHERE start = ?
+                    """, (worker_id, now + self.lease_seconds, datetime.now().isoformat(), row[0]))
+
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+            return row
+
+
+
+    def _update_range(self, start, worker_id, status, lease_expires=None):
+
+        with self.lock:
+            self._transaction()
+            try:
+                updated = self.conn.execute("""
+                    UPDATE ranges SET status = ?, lease_expires = ?, updated_at = ?
+                    WHERE start = ? AND worker = ? AND status = 'leased'
+                """, (status, lease_expires, datetime.now().isoformat(), start, worker_id)).rowcount
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+            # zero rows means the lease expired and another worker took the range over
+            return updated == 1
+
+
+
+    def renew_lease(self, start, worker_id):
+
+        return self._update_range(start, worker_id, "leased", time.time() + self.lease_seconds)
+
+
+
+    def complete_range(self, start, worker_id):
+
+        return self._update_range(start, worker_id, "done")
+
+
+
+    def release_range(self, start, worker_id):
+
+        return self._update_range(start, worker_id, "open")
+
+
+
+    def record_items(self, range_start, statuses):
+
+        with self.lock:
+            # statuses: {tconst: status} or {tconst: (status, detail)}, written in one transaction
+            now = datetime.now().isoformat()
+
+            rows = []
+            for tconst, status in statuses.items():
+                status, detail = status if isinstance(status, tuple) else (status, None)
+                rows.append((tconst, range_start, status, detail, now))
+
+            self._transaction()
+            try:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO items (tconst, range_start, status, detail, updated_at) VALUES (?, ?, ?, ?, ?)",
+                    rows,
+                )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+
+
+    def record_item(self, range_start, tconst, status):
+
+        # as each item finishes, so a crash part way through a range loses nothing already done
+        self.record_items(range_start, {tconst: status})
+
+
+
+    def finished_items(self, tconsts, finished_states):
+
+        with self.lock:
+            tconsts = list(tconsts)
+            finished = set()
+
+            states = ",".join("?" * len(finished_states))
+
+            for start in range(0, len(tconsts), SQL_CHUNK_SIZE):
+                chunk = tconsts[start:start + SQL_CHUNK_SIZE]
+                placeholders = ",".join("?" * len(chunk))
+
+                rows = self.conn.execute(
+                    f"SELECT tconst FROM items WHERE tconst IN ({placeholders}) AND status IN ({states})",
+                    (*chunk, *finished_states),
+                ).fetchall()
+
+                finished.update(row[0] for row in rows)
+
+            return finished
+
+
+
+    def progress(self):
+
+        with self.lock:
+            ranges = dict(self.conn.execute("SELECT status, COUNT(*) FROM ranges GROUP BY status").fetchall())
+            items = dict(self.conn.execute("SELECT status, COUNT(*) FROM items GROUP BY status").fetchall())
+
+            return {"ranges": ranges, "items": items}
+
+
+
+    def close(self):
+
+        with self.lock:
+            self.conn.close()
+
+
+
+class LeaseHeartbeat:
+
+    # renews a range's lease from a background thread for as long as the worker is busy with it,
+    # so a range that outlives CHECKPOINT_LEASE_SECONDS is not leased out a second time
+
+    def __init__(self, store, range_start, worker_id, interval=None):
+
+        self.store = store
+        self.range_start = range_start
+        self.worker_id = worker_id
+
+        self.interval = float(interval or os.getenv("CHECKPOINT_RENEW_SECONDS", store.lease_seconds / 3))
+
+        self.lost = False
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name=f"lease-{range_start}", daemon=True)
+
+
+
+    def _run(self):
+
+        while not self.stop_event.wait(self.interval):
+
+            try:
+                renewed = self.store.renew_lease(self.range_start, self.worker_id)
+            except sqlite3.Error as e:
+                print(f"⚠️ Could not renew lease on range {self.range_start}, retrying: {e}")
+                continue
+
+            if not renewed:
+                self.lost = True
+                print(f"⚠️ Lease on range {self.range_start} was lost, another worker owns it now")
+                return
+
+
+
+    def start(self):
+
+        self.thread.start()
+        return self
+
+
+
+    def stop(self):
+
+        self.stop_event.set()
+        self.thread.join()
@@ -0,0 +1,141 @@
+import os
+import time
+import numpy as np
+from collections import deque
+
+
+class ChromaWriteBuffer:
+
+    def __init__(self, collection, max_items=None, max_interval=None, max_retries=None, retry_backoff=None):
+
+        self.collection = collection
+
+        self.max_items = int(max_items or os.getenv("CHROMA_WRITE_BATCH_SIZE", 256))
+
+        self.max_interval = float(max_interval or os.getenv("CHROMA_WRITE_INTERVAL", 5.0))
+
+        self.max_retries = int(max_retries if max_retries is not None else os.getenv("CHROMA_WRITE_RETRIES", 3))
+
+        self.retry_backoff = float(retry_backoff or os.getenv("CHROMA_WRITE_RETRY_BACKOFF", 1.0))
+
+        self.ids = []
+        self.embeddings = []
+        self.documents = []
+        self.metadatas = []
+        self.contexts = []
+
+        self.first_added_at = None
+
+        self.flush_sizes = deque(maxlen=1000)
+        self.flush_latencies = deque(maxlen=1000)
+        self.counters = {"flushes": 0, "vectors": 0, "retries": 0, "failed_flushes": 0}
+
+
+
+    def __len__(self):
+
+        return len(self.ids)
+
+
+
+    def add(self, id, embedding, document, metadata, context=None):
+
+        if self.first_added_at is None:
+            self.first_added_at = time.monotonic()
+
+        self.ids.append(id)
+        self.embeddings.append(embedding.tolist() if isinstance(embedding, np.ndarray) else embedding)
+        self.documents.append(document)
+        self.metadatas.append(metadata)
+        self.contexts.append(context)
+
+
+
+    def time_until_due(self):
+
+        if self.first_added_at is None:
+            return None
+
+        return max(0.0, self.first_added_at + self.max_interval - time.monotonic())
+
+
+
+    def is_due(self):
+
+        return len(self) >= self.max_items or (self.first_added_at is not None and self.time_until_due() == 0.0)
+
+
+
+    def flush(self):
+
+        # returns (id, context) for every vector written; on failure everything stays buffered
+        if not self.ids:
+            return []
+
+        attempt = 0
+
+        while True:
+
+            start = time.perf_counter()
+
+            try:
+                self.collection.upsert(
+                    ids=self.ids,
+                    embeddings=self.embeddings,
+                    documents=self.documents,
+                    metadatas=self.metadatas,
+                )
+                break
+
+            except Exception as e:
+                if attempt >= self.max_retries:
+                    self.counters["failed_flushes"] += 1
+                    raise
+
+                attempt += 1
+                self.counters["retries"] += 1
+
+                delay = self.retry_backoff * (2 ** (attempt - 1))
+                print(f"⏳Chroma flush of {len(self)} vectors failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+        flushed = list(zip(self.ids, self.contexts))
+
+        self.flush_latencies.append(time.perf_counter() - start)
+        self.flush_sizes.append(len(flushed))
+        self.counters["flushes"] += 1
+        self.counters["vectors"] += len(flushed)
+
+        self.ids, self.embeddings, self.documents, self.metadatas, self.contexts = [], [], [], [], []
+        self.first_added_at = None
+
+        return flushed
+
+
+
+    def discard(self):
+
+        # hands back whatever could not be written so the caller can report it
+        dropped = list(zip(self.ids, self.contexts))
+
+        self.ids, self.embeddings, self.documents, self.metadatas, self.contexts = [], [], [], [], []
+        self.first_added_at = None
+
+        return dropped
+
+
+
+    def stats(self):
+
+        sizes = np.array(self.flush_sizes, dtype=np.float64)
+        latencies_ms = np.array(self.flush_latencies, dtype=np.float64) * 1000
+
+        return {
+            **self.counters,
+            "buffered": len(self),
+            "mean_flush_size": round(float(sizes.mean()), 1) if sizes.size else 0.0,
+            "max_flush_size": int(sizes.max()) if sizes.size else 0,
+            "mean_flush_ms": round(float(latencies_ms.mean()), 2) if latencies_ms.size else 0.0,
+            "p95_flush_ms": round(float(np.percentile(latencies_ms, 95)), 2) if latencies_ms.size else 0.0,
+            "max_flush_ms": round(float(latencies_ms.max()), 2) if latencies_ms.size else 0.0,
+        }
@@ -0,0 +1,180 @@
+import os
+import cv2
+import hashlib
+import threading
+import numpy as np
+from functools import cached_property
+from pathlib import Path
+import onnxruntime as ort
+
+
+parent_dir = Path(__file__).resolve().parent.parent
+
+path_visual_onnx = parent_dir / "onnx" / "visual.onnx"
+
+CLIP_IMAGE_SIZE = 224
+
+# openai/clip-vit-base-patch16 preprocessing constants
+CLIP_MEAN = np.array([0.48145466, 0.4578275, 0.40821073], dtype=np.float32)
+CLIP_STD = np.array([0.26862954, 0.26130258, 0.27577711], dtype=np.float32)
+
+
+class ClipEmbedder:
+
+    def __init__(self, onnx_path=None, providers=None, intra_op_threads=None, batch_size=None):
+
+        self.onnx_path = Path(onnx_path or os.getenv("CLIP_ONNX_PATH", path_visual_onnx))
+
+        self.providers = providers or ['CPUExecutionProvider']
+
+        self.batch_size = int(batch_size or os.getenv("EMBED_BATCH_SIZE", 16))
+
+        session_options = ort.SessionOptions()
+
+        intra_op_threads = int(intra_op_threads or os.getenv("ONNX_INTRA_OP_THREADS", 0))
+        if intra_op_threads:
+            session_options.intra_op_num_threads = intra_op_threads
+
+        self.session = ort.InferenceSession(str(self.onnx_path), sess_options=session_options, providers=self.providers)
+
+        self.input_name = self.session.get_inputs()[0].name
+
+        # (x / 255 - mean) / std folded into one multiply and one subtract, laid out for NCHW
+        self.scale = (1.0 / (255.0 * CLIP_STD)).reshape(1, 3, 1, 1)
+        self.offset = (CLIP_MEAN / CLIP_STD).reshape(1, 3, 1, 1)
+
+        # input buffers are reused across batches, one set per thread calling into the embedder
+        self._buffers = threading.local()
+
+
+
+    @cached_property
+    def model_hash(self):
+
+        digest = hashlib.blake2b(digest_size=6)
+
+        with open(self.onnx_path, "rb") as f:
+            while chunk := f.read(1024 * 1024):
+                digest.update(chunk)
+
+        return digest.hexdigest()
+
+
+
+    def _get_buffers(self):
+
+        if not hasattr(self._buffers, "pixels"):
+            self._buffers.pixels = np.empty((self.batch_size, CLIP_IMAGE_SIZE, CLIP_IMAGE_SIZE, 3), dtype=np.uint8)
+            self._buffers.inputs = np.empty((self.batch_size, 3, CLIP_IMAGE_SIZE, CLIP_IMAGE_SIZE), dtype=np.float32)
+
+        return self._buffers.pixels, self._buffers.inputs
+
+
+
+    def warmup(self):
+
+        # the first run pays for graph optimisation and allocator setup, keep that off the request path
+        dummy = np.zeros((1, 3, CLIP_IMAGE_SIZE, CLIP_IMAGE_SIZE), dtype=np.float32)
+
+        self.session.run(None, {self.input_name: dummy})
+
+
+
+    def resize_and_crop(self, frame, out=None):
+
+        # shortest side to 224 then a centre crop, as CLIPProcessor does
+        height, width = frame.shape[:2]
+        scale = CLIP_IMAGE_SIZE / min(height, width)
+
+        new_width = max(CLIP_IMAGE_SIZE, round(width * scale))
+        new_height = max(CLIP_IMAGE_SIZE, round(height * scale))
+
+        interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_CUBIC
+        resized = cv2.resize(frame, (new_width, new_height), interpolation=interpolation)
+
+        top = (new_height - CLIP_IMAGE_SIZE) // 2
+        left = (new_width - CLIP_IMAGE_SIZE) // 2
+
+        crop = resized[top:top + CLIP_IMAGE_SIZE, left:left + CLIP_IMAGE_SIZE]
+
+        if out is None:
+            return np.ascontiguousarray(crop)
+
+        out[...] = crop
+        return out
+
+
+
+    def _run(self, pixels, count):
+
+        _, inputs = self._get_buffers()
+
+        batch = inputs[:count]
+
+        np.multiply(pixels[:count].transpose(0, 3, 1, 2), self.scale, out=batch)
+        batch -= self.offset
+
+        embeddings = self.session.run(None, {self.input_name: batch})[0]
+
+        return embeddings / np.linalg.norm(embeddings, axis =- 1, keepdims = True)
+
+
+
+    def embed_batch(self, frames):
+
+        # frames: up to batch_size RGB uint8 arrays, returns one L2-normalised row per frame
+        pixels, _ = self._get_buffers()
+
+        for slot, frame in enumerate(frames):
+            self.resize_and_crop(frame, pixels[slot])
+
+        return self._run(pixels, len(frames))
+
+
+
+    def embed_prepared(self, crops):
+
+        # crops already went through resize_and_crop, e.g. on a decode worker
+        pixels, _ = self._get_buffers()
+
+        for slot, crop in enumerate(crops):
+            pixels[slot] = crop
+
+        return self._run(pixels, len(crops))
+
+
+
+    def embed_batches(self, frames):
+
+        batch = []
+
+        for frame in frames:
+
+            batch.append(frame)
+
+            if len(batch) == self.batch_size:
+                yield self.embed_batch(batch)
+                batch = []
+
+        if batch:
+            yield self.embed_batch(batch)
+
+
+
+    def embed_frames(self, frames):
+
+        # running sum of normalised embeddings, so memory stays flat however many frames come in
+        total = None
+        count = 0
+
+        for embeddings in self.embed_batches(frames):
+
+            batch_sum = embeddings.sum(axis = 0, dtype = np.float64)
+            total = batch_sum if total is None else total + batch_sum
+
+            count += len(embeddings)
+
+        if count == 0:
+            return None
+
+        return (total / count).astype(np.float32)
@@ -7,7 +7,9 @@ import pandas as pd
 from pathlib import Path
 from yt_dlp import YoutubeDL
 from dotenv import load_dotenv
+from tqdm import tqdm
 from env_manager import envManager
+from download_scheduler import DownloadScheduler, YtDlpDownloader
 
 
 
@@ -109,18 +111,22 @@ class DownloadMovieTrailers:
 
 
 
-    def download_trailer(self):
+    def trailer_items(self):
 
-        # Process specified range
-        subset = self.movies.iloc[0:]
+        # (tconst, trailer_url) for every row of the batch CSV
+        return [(row['tconst'], row['trailer_url']) for _, row in self.movies.iterrows()]
+
+
+
+    def download_trailer(self, items=None, advance=True):
+
+        # items defaults to the batch CSV; leased runs pass one range's trailers and leave .env alone (advance=False)
+        items = items if items is not None else self.trailer_items()
 
         summary_stats = {}
         results = []
 
-        for index, row in subset.iterrows():
-
-            tconst = row['tconst']
-            url = row['trailer_url']
+        for index, (tconst, url) in enumerate(items):
 
             if url == "Not found":
                 continue
@@ -143,7 +149,7 @@ class DownloadMovieTrailers:
                 print(f"✅✅✅Successfully downloaded trailer for {tconst} from {url} to {path}")
 
                 results.append({
-                    'index': f'[{index + 1}/{len(self.movies)}]',
+                    'index': f'[{index + 1}/{len(items)}]',
                     'tconst': tconst,
                     'file_path': path,
                     'status': 'success'
@@ -153,18 +159,27 @@ class DownloadMovieTrailers:
 
             except Exception as e:
                 results.append({
-                    'index': f'[{index + 1}/{len(self.movies)}]',
+                    'index': f'[{index + 1}/{len(items)}]',
                     'tconst': tconst,
                     'file_path': '',
                     'status': f'error: {str(e)}'
                 })
 
-        successful_downloads = len([r for r in results if r['status'] == 'success'])
+        self.save_download_summary(results, len(items))
+
+        if advance:
+            self.advance_batch()
+
+
+
+    def save_download_summary(self, results, total_processed):
+
+        successful_downloads = len([r for r in results if r['status'] in ('success', 'exists')])
         summary_stats = {
             'timestamp': datetime.datetime.now().strftime('%Y-%m-%d %H:%M'),
-            'total_processed': len(subset),
+            'total_processed': total_processed,
             'total_downloaded': successful_downloads,
-            'total_failed': len(subset) - successful_downloads
+            'total_failed': total_processed - successful_downloads
         }
 
         results_df = pd.DataFrame(results)
@@ -184,6 +199,10 @@ class DownloadMovieTrailers:
             header=True, index=True
         )
 
+
+
+    def advance_batch(self):
+
         new_batch = self.batch + 1
         new_csv = f"movie_trailers_{new_batch}.csv"
 
@@ -198,4 +217,32 @@ class DownloadMovieTrailers:
         envManager.update_env_variable("BATCH", new_batch)
 
 
+
+    def download_trailers_concurrent(self, items=None, advance=True, max_workers=None, per_host_limit=None, downloader=None):
+
+        # same items and advance as download_trailer; pass a LocalFileDownloader as `downloader` to exercise the scheduler offline
+        items = [(tconst, url) for tconst, url in (items if items is not None else self.trailer_items()) if url != "Not found"]
+
+        if downloader is None:
+            message = "========❌❌❌No internet connection available at the moment before starting downloads,"
+            self.retry_on_no_internet_access(message)
+
+            downloader = YtDlpDownloader(self.ydl_opts)
+
+        scheduler = DownloadScheduler(downloader, self.trailers_dir, max_workers=max_workers, per_host_limit=per_host_limit)
+
+        def report(result):
+            mark = "✅✅✅" if result['status'] in ('success', 'exists') else "❌❌❌"
+            print(f"{mark}{result['tconst']}: {result['status']} ({result['seconds']}s)")
+
+        results = scheduler.run(tqdm(items), on_result=report)
+
+        self.save_download_summary(results, len(items))
+
+        if advance:
+            self.advance_batch()
+
+        return results
+
+
 downloadTrailer = DownloadMovieTrailers()
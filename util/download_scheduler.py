@@ -0,0 +1,197 @@
+import os
+import time
+import shutil
+import threading
+from pathlib import Path
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+class YtDlpDownloader:
+
+    def __init__(self, ydl_opts):
+
+        self.ydl_opts = ydl_opts
+
+        # one YoutubeDL per worker thread, reused for every item that thread picks up
+        self._local = threading.local()
+
+
+
+    def _get_ydl(self, partial_dir):
+
+        ydl = getattr(self._local, "ydl", None)
+
+        if ydl is None:
+            from yt_dlp import YoutubeDL
+
+            opts = {
+                **self.ydl_opts,
+                'outtmpl': str(Path(partial_dir) / '%(id)s.%(ext)s'),
+                # keeps yt-dlp's own .part files, so an interrupted download resumes instead of restarting
+                'continuedl': True,
+                'nopart': False,
+            }
+            ydl = self._local.ydl = YoutubeDL(opts)
+
+        return ydl
+
+
+
+    def download(self, tconst, url, partial_dir):
+
+        ydl = self._get_ydl(partial_dir)
+
+        info = ydl.extract_info(url, download=True)
+        downloaded = Path(ydl.prepare_filename(info))
+
+        if not downloaded.exists():
+            raise FileNotFoundError(f"Downloaded file not found: {downloaded}")
+
+        return downloaded
+
+
+
+class LocalFileDownloader:
+
+    # offline stand-in: "downloads" trailers from a local directory so the scheduler runs without network
+
+    def __init__(self, source_dir, chunk_size=1024 * 1024, delay=0.0):
+
+        self.source_dir = Path(source_dir)
+        self.chunk_size = chunk_size
+        self.delay = delay
+
+
+
+    def download(self, tconst, url, partial_dir):
+
+        parsed = urlparse(url)
+        source = Path(parsed.path) if parsed.scheme == "file" else self.source_dir / f"{tconst}.mp4"
+
+        if not source.exists():
+            raise FileNotFoundError(f"No local source for {tconst}: {source}")
+
+        target = Path(partial_dir) / f"{tconst}{source.suffix}"
+
+        # resume from whatever a previous attempt already copied
+        offset = target.stat().st_size if target.exists() else 0
+
+        with open(source, "rb") as src, open(target, "ab") as dst:
+            src.seek(offset)
+            while chunk := src.read(self.chunk_size):
+                dst.write(chunk)
+
+        if self.delay:
+            time.sleep(self.delay)
+
+        return target
+
+
+
+class DownloadScheduler:
+
+    def __init__(self, downloader, target_dir, max_workers=None, per_host_limit=None, max_retries=None, retry_backoff=None):
+
+        self.downloader = downloader
+
+        self.target_dir = Path(target_dir)
+        self.target_dir.mkdir(parents=True, exist_ok=True)
+
+        # in-progress files live next to the target dir so the final rename stays on one filesystem
+        self.partial_dir = self.target_dir / ".partial"
+        self.partial_dir.mkdir(exist_ok=True)
+
+        self.max_workers = int(max_workers or os.getenv("DOWNLOAD_WORKERS", 8))
+
+        self.per_host_limit = int(per_host_limit or os.getenv("DOWNLOAD_PER_HOST_LIMIT", 4))
+
+        self.max_retries = int(max_retries if max_retries is not None else os.getenv("DOWNLOAD_RETRIES", 2))
+
+        self.retry_backoff = float(retry_backoff or os.getenv("DOWNLOAD_RETRY_BACKOFF", 5.0))
+
+        self.host_slots = {}
+        self.host_lock = threading.Lock()
+
+
+
+    def _host_slot(self, url):
+
+        host = urlparse(url).netloc or "local"
+
+        with self.host_lock:
+            if host not in self.host_slots:
+                self.host_slots[host] = threading.BoundedSemaphore(self.per_host_limit)
+
+            return self.host_slots[host]
+
+
+
+    def download_one(self, tconst, url):
+
+        target = self.target_dir / f"{tconst}.mp4"
+        started = time.perf_counter()
+
+        if target.exists():
+            return {"tconst": tconst, "url": url, "file_path": str(target), "status": "exists", "error": "", "seconds": 0.0}
+
+        error = None
+
+        for attempt in range(self.max_retries + 1):
+
+            try:
+                with self._host_slot(url):
+                    downloaded = self.downloader.download(tconst, url, self.partial_dir)
+
+                # readers only ever see complete files: the rename is atomic
+                os.replace(downloaded, target)
+
+                return {
+                    "tconst": tconst,
+                    "url": url,
+                    "file_path": str(target),
+                    "status": "success",
+                    "error": "",
+                    "seconds": round(time.perf_counter() - started, 2),
+                }
+
+            except Exception as e:
+                error = e
+
+                if attempt < self.max_retries:
+                    time.sleep(self.retry_backoff * (2 ** attempt))
+
+        return {
+            "tconst": tconst,
+            "url": url,
+            "file_path": "",
+            "status": f"error: {error}",
+            "error": str(error),
+            "seconds": round(time.perf_counter() - started, 2),
+        }
+
+
+
+    def run(self, items, on_result=None):
+
+        # items: (tconst, url) pairs; results come back in completion order
+        results = []
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="download") as pool:
+
+            futures = [pool.submit(self.download_one, tconst, url) for tconst, url in items]
+
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result)
+
+                if on_result is not None:
+                    on_result(result)
+
+        return results
+
+
+
+    def cleanup_partials(self):
+
+        shutil.rmtree(self.partial_dir, ignore_errors=True)
@@ -1,7 +1,11 @@
+import os
 import logging
+import argparse
 from processTrailerService import ProcessTrailers
 from process_movies import ProcessMovies
 from downLoad_Trailer import DownloadMovieTrailers
+from streaming_pipeline import StreamingIngestion
+from checkpoint_store import CheckpointStore, LeaseHeartbeat, default_worker_id, STREAMING_FINISHED_STATES
 
 
 logging.basicConfig(level=logging.INFO)
@@ -24,18 +28,125 @@ def safe_run(func, name):
         raise
 
 
-if __name__ == "__main__":
+def run_streaming():
+
+    process_movies_instance = safe_init(ProcessMovies, "ProcessMovies")
+
+    download_trailer_instance = safe_init(DownloadMovieTrailers, "DownloadMovieTrailers")
+
+    process_trailer_service_instance = safe_init(ProcessTrailers, "ProcessTrailers")
+
+    streaming = StreamingIngestion(process_movies_instance, download_trailer_instance, process_trailer_service_instance)
+
+    summary = streaming.run()
+
+    logger.info(f"Streaming ingestion finished: {summary}")
+
+
+def run_streaming_leased(worker_id=None, range_size=None):
+
+    # several machines can run this against one checkpoint database, each leasing its own ranges
+    store = CheckpointStore()
+    worker_id = worker_id or default_worker_id()
 
     process_movies_instance = safe_init(ProcessMovies, "ProcessMovies")
 
-    safe_run(process_movies_instance.process_movies, "process_movies")
+    download_trailer_instance = safe_init(DownloadMovieTrailers, "DownloadMovieTrailers")
+
+    process_trailer_service_instance = safe_init(ProcessTrailers, "ProcessTrailers")
+
+    store.seed_ranges(len(process_movies_instance.movies), int(range_size or os.getenv("CHECKPOINT_RANGE_SIZE", 100)))
+
+    while (leased := store.lease_range(worker_id)) is not None:
+
+        start, stop = leased
+        process_movies_instance.START_INDEX, process_movies_instance.END_INDEX = start, stop
+
+        heartbeat = LeaseHeartbeat(store, start, worker_id).start()
+
+        try:
+            rows = process_movies_instance.select_rows()
+
+            finished = store.finished_items([tconst for _, tconst, _, _ in rows], STREAMING_FINISHED_STATES)
+            rows = [row for row in rows if row[1] not in finished]
+
+            # each movie's outcome is recorded the moment it lands, a crash mid-range only redoes the unfinished ones
+            streaming = StreamingIngestion(process_movies_instance, download_trailer_instance, process_trailer_service_instance,
+                                           on_outcome=lambda tconst, outcome: store.record_item(start, tconst, outcome))
+            summary = streaming.run(rows)
+
+        except Exception:
+            heartbeat.stop()
+            store.release_range(start, worker_id)
+            raise
+
+        heartbeat.stop()
+
+        if not store.complete_range(start, worker_id):
+            logger.warning(f"Lease on range {start}-{stop} expired before it finished, another worker owns it now")
+
+        logger.info(f"Range {start}-{stop} finished: {summary}")
+
+    logger.info(f"No ranges left to lease: {store.progress()}")
+
+    store.close()
+
+
+def run_batch_leased(worker_id=None, range_size=None, concurrent_downloads=False):
+
+    # lookup and download per leased range, then one embedding pass over the downloaded trailers
+    process_movies_instance = safe_init(ProcessMovies, "ProcessMovies")
 
     download_trailer_instance = safe_init(DownloadMovieTrailers, "DownloadMovieTrailers")
 
-    safe_run(download_trailer_instance.download_trailer, "download_trailer")
-    
+    download_items = download_trailer_instance.download_trailers_concurrent if concurrent_downloads else download_trailer_instance.download_trailer
+
+    def download(results):
+        download_items([(r["tconst"], r["trailer_url"]) for r in results], advance=False)
+
+    safe_run(lambda: process_movies_instance.process_movies_leased(worker_id, range_size, on_results=download), "process_movies_leased")
+
+    # the manifest skips trailers already embedded, so a rerun after a crash here only embeds the rest
     process_trailer_service_instance = safe_init(ProcessTrailers, "ProcessTrailers")
 
     safe_run(process_trailer_service_instance.processTrailer, "processTrailer")
-    
-    logger.info("All processes completed successfully.")
\ No newline at end of file
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Fetch, download and embed movie trailers.")
+    parser.add_argument("--streaming", action="store_true",
+                        help="move each movie through lookup, download and embedding independently instead of three batch passes")
+    parser.add_argument("--leased", action="store_true",
+                        help="lease catalog ranges from the checkpoint store instead of reading and rewriting START_INDEX/END_INDEX in .env")
+    parser.add_argument("--worker-id", default=None, help="name this worker in the checkpoint store (default host:pid)")
+    parser.add_argument("--concurrent-downloads", action="store_true",
+                        help="download with the pooled, per-host limited scheduler (DOWNLOAD_WORKERS, DOWNLOAD_PER_HOST_LIMIT) instead of one trailer at a time")
+    args = parser.parse_args()
+
+    if args.streaming and args.leased:
+        safe_run(lambda: run_streaming_leased(args.worker_id), "leased streaming pipeline")
+
+    elif args.streaming:
+        safe_run(run_streaming, "streaming pipeline")
+
+    elif args.leased:
+        run_batch_leased(args.worker_id, concurrent_downloads=args.concurrent_downloads)
+
+    else:
+        process_movies_instance = safe_init(ProcessMovies, "ProcessMovies")
+
+        safe_run(process_movies_instance.process_movies, "process_movies")
+
+        download_trailer_instance = safe_init(DownloadMovieTrailers, "DownloadMovieTrailers")
+
+        if args.concurrent_downloads:
+            safe_run(download_trailer_instance.download_trailers_concurrent, "download_trailers_concurrent")
+        else:
+            safe_run(download_trailer_instance.download_trailer, "download_trailer")
+
+        process_trailer_service_instance = safe_init(ProcessTrailers, "ProcessTrailers")
+
+        safe_run(process_trailer_service_instance.processTrailer, "processTrailer")
+
+        logger.info("All processes completed successfully.")
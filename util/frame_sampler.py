@@ -0,0 +1,128 @@
+import os
+import cv2
+import numpy as np
+
+
+class FrameSampler:
+
+    def __init__(self, num_frames=None, frames_per_second=None, keyframes_only=None):
+
+        self.num_frames = int(num_frames or os.getenv("NUMBER_OF_FRAMES", 100))
+
+        # time based sampling wins over the fixed frame count when it is set
+        self.frames_per_second = float(frames_per_second or os.getenv("FRAME_SAMPLING_FPS", 0)) or None
+
+        if keyframes_only is None:
+            keyframes_only = os.getenv("FRAME_SAMPLING_KEYFRAMES", "false").lower() in ("1", "true", "yes")
+
+        self.keyframes_only = keyframes_only
+
+
+
+    def describe(self):
+
+        sampling = f"fps{self.frames_per_second:g}" if self.frames_per_second else f"n{self.num_frames}"
+
+        return f"{sampling}+kf" if self.keyframes_only else sampling
+
+
+
+    def frame_ids(self, total_frames, video_fps):
+
+        if self.frames_per_second and video_fps > 0:
+            step = max(video_fps / self.frames_per_second, 1.0)
+            return np.unique(np.arange(0, total_frames, step).astype(np.int64)).tolist()
+
+        if total_frames < self.num_frames:
+            return list(range(total_frames))
+
+        step = total_frames // self.num_frames
+        return [i * step for i in range(self.num_frames)]
+
+
+
+    def sample(self, video_path, on_frame=None):
+
+        if self.keyframes_only:
+            yield from self._sample_keyframes(video_path, on_frame)
+        else:
+            yield from self._sample_sequential(video_path, on_frame)
+
+
+
+    def _sample_sequential(self, video_path, on_frame=None):
+
+        # walk the stream once: grab() every frame, retrieve() only the sampled ones
+        cap = cv2.VideoCapture(str(video_path))
+
+        try:
+            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            video_fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+
+            frame_ids = self.frame_ids(total_frames, video_fps)
+
+            position = 0
+
+            for index, frame_id in enumerate(frame_ids):
+
+                while position < frame_id and cap.grab():
+                    position += 1
+
+                success = position == frame_id and cap.grab()
+
+                if success:
+                    position += 1
+                    success, frame = cap.retrieve()
+
+                if on_frame is not None:
+                    on_frame(frame_id, success)
+
+                if not success:
+                    # the stream ended early, nothing after this point can be read either
+                    if on_frame is not None:
+                        for missed in frame_ids[index + 1:]:
+                            on_frame(missed, False)
+                    break
+
+                timestamp = frame_id / video_fps if video_fps > 0 else 0.0
+
+                yield frame_id, timestamp, cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+        finally:
+            cap.release()
+
+
+
+    def _sample_keyframes(self, video_path, on_frame=None):
+
+        # OpenCV cannot skip non-key frames, PyAV tells the decoder to drop them before decoding
+        try:
+            import av
+        except ImportError as e:
+            raise ImportError("Keyframe sampling requires PyAV, install it with `pip install av`") from e
+
+        with av.open(str(video_path)) as container:
+
+            stream = container.streams.video[0]
+            stream.codec_context.skip_frame = "NONKEY"
+
+            video_fps = float(stream.average_rate or 0)
+
+            min_gap = 1.0 / self.frames_per_second if self.frames_per_second else 0.0
+            last_timestamp = None
+
+            for frame in container.decode(stream):
+
+                timestamp = float(frame.time or 0.0)
+
+                if last_timestamp is not None and timestamp - last_timestamp < min_gap:
+                    continue
+
+                last_timestamp = timestamp
+
+                frame_id = int(round(timestamp * video_fps))
+
+                if on_frame is not None:
+                    on_frame(frame_id, True)
+
+                yield frame_id, timestamp, frame.to_ndarray(format="rgb24")
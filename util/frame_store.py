@@ -0,0 +1,109 @@
+import os
+import sqlite3
+import threading
+import numpy as np
+from pathlib import Path
+from datetime import datetime
+
+
+parent_dir = Path(__file__).resolve().parent.parent
+
+path_frame_store = parent_dir / "Data" / "frame_store"
+
+
+class FrameStore:
+
+    # per-frame CLIP embeddings: one contiguous float16 (frames, dim) .npy per trailer, its timestamps beside it,
+    # and a small SQLite index saying which model and sampling produced each file
+
+    def __init__(self, path=None):
+
+        self.path = Path(path or os.getenv("FRAME_STORE_PATH", path_frame_store))
+        self.path.mkdir(parents=True, exist_ok=True)
+
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.path / "index.sqlite3"), check_same_thread=False)
+
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS frames (
+                    tconst TEXT PRIMARY KEY,
+                    path TEXT,
+                    frame_count INTEGER,
+                    dim INTEGER,
+                    frame_version TEXT,
+                    updated_at TEXT
+                )
+            """)
+
+
+
+    def _files(self, tconst):
+
+        return self.path / f"{tconst}.npy", self.path / f"{tconst}.timestamps.npy"
+
+
+
+    @staticmethod
+    def _save_atomic(path, array):
+
+        tmp = path.with_name(f"{path.stem}.tmp.npy")
+        np.save(tmp, array)
+        os.replace(tmp, path)
+
+
+
+    def put(self, tconst, timestamps, embeddings, frame_version, source_path=None):
+
+        embeddings_file, timestamps_file = self._files(tconst)
+
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float16)
+
+        # each file is replaced atomically and the index row goes last; get() rejects a pair left mismatched by a crash
+        self._save_atomic(timestamps_file, np.asarray(timestamps, dtype=np.float32))
+        self._save_atomic(embeddings_file, embeddings)
+
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO frames (tconst, path, frame_count, dim, frame_version, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (tconst, str(source_path) if source_path else None, len(embeddings),
+                 embeddings.shape[1] if embeddings.ndim == 2 else 0, frame_version, datetime.now().isoformat()),
+            )
+
+
+
+    def get(self, tconst):
+
+        # memory-mapped, so a re-aggregation pass only pages in the trailers it touches
+        embeddings_file, timestamps_file = self._files(tconst)
+
+        timestamps = np.load(timestamps_file)
+        embeddings = np.load(embeddings_file, mmap_mode="r")
+
+        if len(timestamps) != len(embeddings):
+            raise ValueError(f"Frame store entry for {tconst} is inconsistent ({len(timestamps)} timestamps, {len(embeddings)} frames)")
+
+        return timestamps, embeddings
+
+
+
+    def entries(self, frame_version=None):
+
+        with self.lock:
+            if frame_version is None:
+                rows = self.conn.execute("SELECT tconst, path, frame_count, frame_version FROM frames ORDER BY tconst").fetchall()
+            else:
+                rows = self.conn.execute(
+                    "SELECT tconst, path, frame_count, frame_version FROM frames WHERE frame_version = ? ORDER BY tconst",
+                    (frame_version,),
+                ).fetchall()
+
+        return [{"tconst": r[0], "path": r[1], "frame_count": r[2], "frame_version": r[3]} for r in rows]
+
+
+
+    def close(self):
+
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,179 @@
+import os
+import sys
+import json
+import atexit
+import time
+import queue
+import threading
+from pathlib import Path
+from datetime import datetime
+
+
+parent_dir = Path(__file__).resolve().parent.parent
+
+path_ingestion_log = parent_dir / "logs" / "ingestion.jsonl"
+
+# higher levels are chattier: "frame" also writes every "trailer" and "run" record
+LEVELS = {"run": 0, "trailer": 1, "frame": 2}
+
+
+class IngestionLogSink:
+
+    def __init__(self, path=None, verbosity=None, max_bytes=None, backup_count=None,
+                 batch_size=None, flush_interval=None, queue_size=None):
+
+        self.path = Path(path or os.getenv("INGEST_LOG_PATH", path_ingestion_log))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self.verbosity = LEVELS[(verbosity or os.getenv("INGEST_LOG_LEVEL", "trailer")).lower()]
+
+        self.max_bytes = int(max_bytes or float(os.getenv("INGEST_LOG_MAX_MB", 50)) * 1024 * 1024)
+
+        self.backup_count = int(backup_count or os.getenv("INGEST_LOG_BACKUPS", 5))
+
+        self.batch_size = int(batch_size or os.getenv("INGEST_LOG_BATCH_SIZE", 512))
+
+        self.flush_interval = float(flush_interval or os.getenv("INGEST_LOG_FLUSH_INTERVAL", 1.0))
+
+        # callers never wait on disk: records go on a queue and a background thread writes them
+        self.queue = queue.Queue(maxsize=int(queue_size or os.getenv("INGEST_LOG_QUEUE_SIZE", 100000)))
+
+        self.dropped = 0
+
+        self.file = open(self.path, "a", encoding="utf-8")
+
+        self.closed = False
+
+        self.thread = threading.Thread(target=self._writer, name="ingestion-log", daemon=True)
+        self.thread.start()
+
+        atexit.register(self.close)
+
+
+
+    def enabled(self, level):
+
+        return LEVELS[level] <= self.verbosity
+
+
+
+    def log(self, level, event, **fields):
+
+        if LEVELS[level] > self.verbosity:
+            return
+
+        record = {"ts": datetime.now().isoformat(timespec="milliseconds"), "level": level, "event": event, **fields}
+
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # a stalled disk must not stall ingestion, count what was lost instead
+            self.dropped += 1
+
+
+
+    def run(self, event, **fields):
+        self.log("run", event, **fields)
+
+    def trailer(self, event, **fields):
+        self.log("trailer", event, **fields)
+
+    def frame(self, event, **fields):
+        self.log("frame", event, **fields)
+
+
+
+    def _writer(self):
+
+        running = True
+
+        while running:
+
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+
+            while len(batch) < self.batch_size:
+
+                try:
+                    record = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+
+                if record is None:
+                    self.queue.task_done()
+                    running = False
+                    break
+
+                batch.append(record)
+
+            if not batch:
+                continue
+
+            # a failed write or rotation loses this batch, not the writer; task_done still runs so flush() returns
+            written = False
+            try:
+                self.file.write("".join(json.dumps(record, ensure_ascii=False, default=str) + "\n" for record in batch))
+                self.file.flush()
+                written = True
+
+                if self.file.tell() >= self.max_bytes:
+                    self._rotate()
+
+            except Exception as e:
+                if written:
+                    print(f"❌Ingestion log rotation failed: {e}", file=sys.stderr)
+                else:
+                    self.dropped += len(batch)
+                    print(f"❌Ingestion log write failed, {len(batch)} records lost: {e}", file=sys.stderr)
+
+                if self.file.closed:
+                    try:
+                        self.file = open(self.path, "a", encoding="utf-8")
+                    except OSError:
+                        pass
+
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+
+
+    def _rotate(self):
+
+        self.file.close()
+
+        # ingestion.jsonl -> ingestion.jsonl.1 -> ... -> ingestion.jsonl.<backup_count>
+        for index in range(self.backup_count - 1, 0, -1):
+            source = self.path.with_name(f"{self.path.name}.{index}")
+            if source.exists():
+                os.replace(source, self.path.with_name(f"{self.path.name}.{index + 1}"))
+
+        if self.backup_count > 0:
+            os.replace(self.path, self.path.with_name(f"{self.path.name}.1"))
+        else:
+            self.path.unlink()
+
+        self.file = open(self.path, "a", encoding="utf-8")
+
+
+
+    def flush(self):
+
+        # blocks until everything queued so far is on disk
+        self.queue.join()
+
+
+
+    def close(self):
+
+        if self.closed:
+            return
+
+        self.closed = True
+
+        if self.dropped:
+            self.run("log_records_dropped", count=self.dropped)
+
+        self.queue.put(None)
+        self.thread.join()
+        self.file.close()
@@ -0,0 +1,166 @@
+import os
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from datetime import datetime
+
+
+parent_dir = Path(__file__).resolve().parent.parent
+
+path_manifest = parent_dir / "Data" / "ingestion_manifest.sqlite3"
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_hash(path):
+
+    digest = hashlib.blake2b(digest_size=20)
+
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+class IngestionManifest:
+
+    def __init__(self, path=None):
+
+        self.path = Path(path or os.getenv("INGESTION_MANIFEST_PATH", path_manifest))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        # pipeline callbacks arrive on the writer thread, so one connection is shared behind a lock
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS trailers (
+                    tconst TEXT PRIMARY KEY,
+                    path TEXT,
+                    size INTEGER,
+                    mtime REAL,
+                    content_hash TEXT,
+                    frame_count INTEGER,
+                    model_version TEXT,
+                    status TEXT,
+                    error TEXT,
+                    updated_at TEXT
+                )
+            """)
+
+
+
+    def rows(self):
+
+        with self.lock:
+            cursor = self.conn.execute(
+                "SELECT tconst, size, mtime, content_hash, model_version, status FROM trailers"
+            )
+            columns = [c[0] for c in cursor.description]
+
+            return {row[0]: dict(zip(columns, row)) for row in cursor.fetchall()}
+
+
+
+    def plan(self, trailers, existing_ids, model_version):
+
+        # trailers: (tconst, path) pairs on disk, existing_ids: ids already in the collection
+        known = self.rows()
+
+        to_embed = []
+        skipped = 0
+
+        for tconst, path in trailers:
+
+            stat = os.stat(path)
+            row = known.get(tconst)
+
+            unchanged = row is not None and row["size"] == stat.st_size and row["mtime"] == stat.st_mtime
+            content_hash = row["content_hash"] if unchanged else None
+
+            if row is not None and not unchanged:
+                # touched but maybe not modified, only the content hash can tell
+                content_hash = file_hash(path)
+                unchanged = content_hash == row["content_hash"]
+
+                if unchanged:
+                    self._update_stat(tconst, stat)
+
+            if (unchanged and row["status"] == "embedded" and row["model_version"] == model_version
+                    and tconst in existing_ids):
+                skipped += 1
+                continue
+
+            to_embed.append((tconst, path, stat, content_hash))
+
+        return to_embed, skipped
+
+
+
+    def _update_stat(self, tconst, stat):
+
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE trailers SET size = ?, mtime = ? WHERE tconst = ?",
+                (stat.st_size, stat.st_mtime, tconst),
+            )
+
+
+
+    def mark_pending(self, tconst, path, stat, content_hash, model_version):
+
+        content_hash = content_hash or file_hash(path)
+
+        with self.lock, self.conn:
+            self.conn.execute("""
+                INSERT INTO trailers (tconst, path, size, mtime, content_hash, frame_count, model_version, status, error, updated_at)
+                VALUES (?, ?, ?, ?, ?, NULL, ?, 'pending', NULL, ?)
+                ON CONFLICT(tconst) DO UPDATE SET
+                    path = excluded.path, size = excluded.size, mtime = excluded.mtime,
+                    content_hash = excluded.content_hash, model_version = excluded.model_version,
+                    status = 'pending', error = NULL, updated_at = excluded.updated_at
+            """, (tconst, str(path), stat.st_size, stat.st_mtime, content_hash, model_version, datetime.now().isoformat()))
+
+
+
+    def mark_embedded(self, tconst, frame_count):
+
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE trailers SET status = 'embedded', frame_count = ?, error = NULL, updated_at = ? WHERE tconst = ?",
+                (frame_count, datetime.now().isoformat(), tconst),
+            )
+
+
+
+    def mark_failed(self, tconst, error):
+
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE trailers SET status = 'failed', error = ?, updated_at = ? WHERE tconst = ?",
+                (str(error), datetime.now().isoformat(), tconst),
+            )
+
+
+
+    def set_model_version(self, tconsts, model_version):
+
+        # vectors rebuilt offline (e.g. from the frame store) now match model_version without re-embedding
+        now = datetime.now().isoformat()
+
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "UPDATE trailers SET model_version = ?, updated_at = ? WHERE tconst = ? AND status = 'embedded'",
+                [(model_version, now, tconst) for tconst in tconsts],
+            )
+
+
+
+    def close(self):
+
+        with self.lock:
+            self.conn.close()
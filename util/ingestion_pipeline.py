@@ -0,0 +1,425 @@
+import os
+import time
+import queue
+import threading
+import numpy as np
+from chroma_write_buffer import ChromaWriteBuffer
+from scene_segmenter import SceneSegmenter
+
+# end-of-stream marker passed down every stage queue
+STOP = object()
+
+
+class IngestionPipeline:
+
+    def __init__(self, embedder, sampler, collection, decode_workers=None, inference_workers=None,
+                 queue_size=None, batch_timeout=None, on_stored=None, on_failed=None, write_buffer=None,
+                 on_frame=None, scene_collection=None, segmenter=None, frame_store=None):
+
+        self.embedder = embedder
+        self.sampler = sampler
+        self.collection = collection
+
+        # the single writer collects vectors and upserts them in bulk
+        self.write_buffer = write_buffer or ChromaWriteBuffer(collection)
+
+        # optional scene-level index: per-frame embeddings are kept until the trailer is split into scenes
+        self.scene_collection = scene_collection
+        self.scene_buffer = ChromaWriteBuffer(scene_collection) if scene_collection is not None else None
+        self.segmenter = segmenter or (SceneSegmenter() if scene_collection is not None else None)
+
+        # trailers whose old scenes go in one bulk delete ahead of the next scene flush
+        self.scene_deletes = set()
+
+        # per-frame embeddings persisted so pooling or sampling changes can be re-run without decoding again
+        self.frame_store = frame_store
+        self.frame_version = f"{embedder.model_hash}:{sampler.describe()}" if frame_store is not None else None
+
+        self.keep_frames = self.scene_collection is not None or self.frame_store is not None
+
+        self.decode_workers = int(decode_workers or os.getenv("INGEST_DECODE_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+
+        # onnxruntime already uses every core inside one run, extra inference workers mostly help small batches
+        self.inference_workers = int(inference_workers or os.getenv("INGEST_INFERENCE_WORKERS", 1))
+
+        queue_size = int(queue_size or os.getenv("INGEST_QUEUE_SIZE", 8 * embedder.batch_size))
+
+        # how long a partial batch waits for frames from other trailers before it runs anyway
+        self.batch_timeout = float(batch_timeout or os.getenv("INGEST_BATCH_TIMEOUT", 0.05))
+
+        self.on_stored = on_stored
+        self.on_failed = on_failed
+        self.on_frame = on_frame
+
+        # bounded queues give backpressure: a slow stage stalls the one feeding it
+        self.input_queue = queue.Queue(maxsize=self.decode_workers * 2)
+        self.frame_queue = queue.Queue(maxsize=queue_size)
+        self.write_queue = queue.Queue(maxsize=queue_size)
+
+        self.state_lock = threading.Lock()
+        self.trailers = {}
+
+        self.stats = {"submitted": 0, "stored": 0, "failed": 0, "frames": 0, "batches": 0, "scenes": 0}
+
+        self.started_at = None
+
+
+
+    def start(self):
+
+        self.started_at = time.perf_counter()
+
+        self.decode_threads = [threading.Thread(target=self._decode_worker, name=f"decode-{i}", daemon=True) for i in range(self.decode_workers)]
+        self.inference_threads = [threading.Thread(target=self._inference_worker, name=f"inference-{i}", daemon=True) for i in range(self.inference_workers)]
+        self.writer_thread = threading.Thread(target=self._writer, name="chroma-writer", daemon=True)
+
+        for thread in self.decode_threads + self.inference_threads + [self.writer_thread]:
+            thread.start()
+
+
+
+    def submit(self, tconst, path):
+
+        # blocks while the decode pool is saturated; safe to call from several producer threads
+        with self.state_lock:
+            self.stats["submitted"] += 1
+
+        self.input_queue.put((tconst, path))
+
+
+
+    def close(self):
+
+        # drain stage by stage so nothing behind a stop marker is lost
+        for _ in self.decode_threads:
+            self.input_queue.put(STOP)
+        for thread in self.decode_threads:
+            thread.join()
+
+        for _ in self.inference_threads:
+            self.frame_queue.put(STOP)
+        for thread in self.inference_threads:
+            thread.join()
+
+        self.write_queue.put(STOP)
+        self.writer_thread.join()
+
+        return self.summary()
+
+
+
+    def run(self, items):
+
+        self.start()
+
+        for tconst, path in items:
+            self.submit(tconst, path)
+
+        return self.close()
+
+
+
+    def summary(self):
+
+        elapsed = time.perf_counter() - self.started_at if self.started_at else 0.0
+
+        with self.state_lock:
+            stats = dict(self.stats)
+
+        return {
+            **stats,
+            "writes": self.write_buffer.stats(),
+            **({"scene_writes": self.scene_buffer.stats()} if self.scene_buffer is not None else {}),
+            "elapsed_seconds": round(elapsed, 2),
+            "trailers_per_minute": round(stats["stored"] * 60 / elapsed, 2) if elapsed else 0.0,
+        }
+
+
+
+    def _fail(self, tconst, path, reason):
+
+        with self.state_lock:
+            self.trailers.pop(tconst, None)
+            self.stats["failed"] += 1
+
+        if self.on_failed is not None:
+            try:
+                self.on_failed(tconst, path, reason)
+            except Exception as e:
+                print(f"⚠️ on_failed callback raised for {tconst}: {e}")
+
+
+
+    def _decode_worker(self):
+
+        while True:
+
+            item = self.input_queue.get()
+            if item is STOP:
+                return
+
+            tconst, path = item
+
+            with self.state_lock:
+                self.trailers[tconst] = {"sum": None, "done": 0, "expected": None, "path": path, "frames": [] if self.keep_frames else None}
+
+            frames_read = 0
+
+            on_frame = None
+            if self.on_frame is not None:
+                on_frame = lambda frameId, success, tconst=tconst: self.on_frame(tconst, frameId, success)
+
+            try:
+                for _, timestamp, frame in self.sampler.sample(path, on_frame=on_frame):
+                    self.frame_queue.put(("frame", tconst, (timestamp, self.embedder.resize_and_crop(frame))))
+                    frames_read += 1
+
+            except Exception as e:
+                # frames read before the error still count, the reason only matters if there are none
+                with self.state_lock:
+                    if tconst in self.trailers:
+                        self.trailers[tconst]["error"] = f"decode error: {e}"
+
+            self.frame_queue.put(("end", tconst, frames_read))
+
+
+
+    def _inference_worker(self):
+
+        pending = []
+
+        while True:
+
+            try:
+                item = self.frame_queue.get(timeout=self.batch_timeout if pending else None)
+            except queue.Empty:
+                self._embed_pending(pending)
+                pending = []
+                continue
+
+            if item is STOP:
+                self._embed_pending(pending)
+                return
+
+            kind, tconst, value = item
+
+            if kind == "frame":
+                pending.append((tconst, *value))
+
+                # batches are filled with frames from whichever trailers are in flight
+                if len(pending) == self.embedder.batch_size:
+                    self._embed_pending(pending)
+                    pending = []
+
+            else:
+                self._expect(tconst, value)
+
+
+
+    def _embed_pending(self, pending):
+
+        if not pending:
+            return
+
+        try:
+            embeddings = self.embedder.embed_prepared([crop for _, _, crop in pending])
+
+        except Exception as e:
+            with self.state_lock:
+                paths = {tconst: self.trailers.get(tconst, {}).get("path") for tconst, _, _ in pending}
+
+            for tconst, path in paths.items():
+                self._fail(tconst, path, f"inference failed: {e}")
+            return
+
+        completed = []
+
+        with self.state_lock:
+            self.stats["frames"] += len(pending)
+            self.stats["batches"] += 1
+
+            for (tconst, timestamp, _), row in zip(pending, embeddings):
+
+                trailer = self.trailers.get(tconst)
+                if trailer is None:
+                    continue
+
+                trailer["sum"] = row.astype(np.float64) if trailer["sum"] is None else trailer["sum"] + row
+                trailer["done"] += 1
+
+                if trailer["frames"] is not None:
+                    trailer["frames"].append((timestamp, row))
+
+            for tconst in {tconst for tconst, _, _ in pending}:
+                if self._is_complete(tconst):
+                    completed.append((tconst, self.trailers.pop(tconst)))
+
+        for tconst, trailer in completed:
+            self._emit(tconst, trailer)
+
+
+
+    def _expect(self, tconst, expected):
+
+        with self.state_lock:
+            trailer = self.trailers.get(tconst)
+            if trailer is None:
+                return
+
+            trailer["expected"] = expected
+
+            completed = self.trailers.pop(tconst) if self._is_complete(tconst) else None
+
+        if completed is not None:
+            self._emit(tconst, completed)
+
+
+
+    def _is_complete(self, tconst):
+
+        trailer = self.trailers.get(tconst)
+
+        return trailer is not None and trailer["expected"] is not None and trailer["done"] >= trailer["expected"]
+
+
+
+    def _emit(self, tconst, trailer):
+
+        if trailer["done"] == 0:
+            self._fail(tconst, trailer["path"], trailer.get("error", "no frames could be read"))
+            return
+
+        vector = (trailer["sum"] / trailer["done"]).astype(np.float32)
+
+        frames = None
+        if trailer["frames"]:
+            # several inference workers can finish batches out of order
+            trailer["frames"].sort(key=lambda frame: frame[0])
+            frames = (np.array([t for t, _ in trailer["frames"]]), np.stack([row for _, row in trailer["frames"]]))
+
+        self.write_queue.put((tconst, trailer["path"], vector, trailer["done"], frames))
+
+
+
+    def _flush_scenes(self, final=False):
+
+        # a re-embedded trailer may split into fewer scenes than last time, its old ones must not linger;
+        # cleared before its new scenes are upserted, in one delete per flush
+        if self.scene_deletes:
+            try:
+                self.scene_collection.delete(where={"tconst": {"$in": sorted(self.scene_deletes)}})
+            except Exception as e:
+                print(f"⚠️ Could not clear old scenes for {len(self.scene_deletes)} trailers: {e}")
+
+            self.scene_deletes.clear()
+
+        # scenes are secondary: a failed flush is reported but never fails the trailer itself
+        try:
+            scenes = len(self.scene_buffer.flush())
+
+            with self.state_lock:
+                self.stats["scenes"] += scenes
+
+        except Exception as e:
+            if final:
+                dropped = {tconst for _, tconst in self.scene_buffer.discard()}
+                print(f"❌Scene flush failed, {len(dropped)} trailers have no scene vectors: {e}")
+            else:
+                print(f"❌Scene flush failed, keeping {len(self.scene_buffer)} scenes buffered: {e}")
+
+
+
+    def _add_scenes(self, tconst, path, timestamps, embeddings):
+
+        scenes = self.segmenter.segment(timestamps, embeddings)
+
+        self.scene_deletes.add(tconst)
+
+        for i, (start, end, vector) in enumerate(scenes):
+            self.scene_buffer.add(f"{tconst}:{i:04d}", vector, f"Scene {i} of {tconst}",
+                                  {"tconst": tconst, "start": start, "end": end, "filename": path}, context=tconst)
+
+
+
+    def _flush_writes(self, final=False):
+
+        if self.scene_buffer is not None:
+            self._flush_scenes(final)
+
+        try:
+            flushed = self.write_buffer.flush()
+
+        except Exception as e:
+            if not final:
+                # vectors stay buffered and go out with the next flush
+                print(f"❌Chroma flush failed, keeping {len(self.write_buffer)} vectors buffered: {e}")
+                return
+
+            flushed = []
+            for tconst, (path, _) in self.write_buffer.discard():
+                self._fail(tconst, path, f"write failed: {e}")
+
+        with self.state_lock:
+            self.stats["stored"] += len(flushed)
+
+        if self.on_stored is not None:
+            for tconst, (path, frame_count) in flushed:
+                # the vector is already written; failed bookkeeping (e.g. a manifest write) is reported, not fatal
+                try:
+                    self.on_stored(tconst, path, frame_count)
+                except Exception as e:
+                    print(f"⚠️ {tconst} is stored but its on_stored callback raised: {e}")
+
+
+
+    def _store(self, tconst, path, vector, frame_count, frames):
+
+        # upsert so a changed trailer or a new model version replaces the stored vector
+        self.write_buffer.add(tconst, vector, f"Trailer for {tconst}", {"filename": path}, context=(path, frame_count))
+
+        # per-frame and scene bookkeeping is secondary, it never fails a trailer whose vector is buffered
+        if frames is not None and self.frame_store is not None:
+            try:
+                self.frame_store.put(tconst, *frames, self.frame_version, source_path=path)
+            except Exception as e:
+                print(f"⚠️ Could not store frame embeddings for {tconst}: {e}")
+
+        if frames is not None and self.scene_buffer is not None:
+            try:
+                self._add_scenes(tconst, path, *frames)
+            except Exception as e:
+                print(f"⚠️ Could not segment {tconst} into scenes: {e}")
+
+
+
+    def _writer(self):
+
+        # the only consumer of write_queue: if it died, inference would block on put and close() would hang,
+        # so an error fails the trailer (or is reported) and the loop keeps going
+        while True:
+
+            try:
+                item = self.write_queue.get(timeout=self.write_buffer.time_until_due())
+            except queue.Empty:
+                item = None
+
+            if item is STOP:
+                try:
+                    self._flush_writes(final=True)
+                except Exception as e:
+                    print(f"❌Final write flush failed: {e}")
+                return
+
+            try:
+                if item is not None:
+                    self._store(*item)
+
+                if item is None or self.write_buffer.is_due() or (self.scene_buffer is not None and self.scene_buffer.is_due()):
+                    self._flush_writes()
+
+            except Exception as e:
+                print(f"❌Writer error{f' on {item[0]}' if item is not None else ''}: {e}")
+
+                # a trailer whose vector made it into the buffer is still stored by the next flush
+                if item is not None and item[0] not in self.write_buffer.ids:
+                    self._fail(item[0], item[1], f"write failed: {e}")
@@ -1,14 +1,15 @@
 import os
-import cv2
-import numpy as np
 from tqdm import tqdm
-from PIL import Image
 from pathlib import Path
-import onnxruntime as ort
-from datetime import datetime
 from dotenv import load_dotenv
 from chromadb import PersistentClient
-from transformers import CLIPProcessor
+from clip_embedder import ClipEmbedder
+from frame_sampler import FrameSampler
+from ingestion_pipeline import IngestionPipeline
+from ingestion_manifest import IngestionManifest
+from ingestion_logger import IngestionLogSink
+from scene_segmenter import SceneSegmenter
+from frame_store import FrameStore
 load_dotenv()
 
 
@@ -21,30 +22,31 @@ class ProcessTrailers:
         #file paths
         self.parent_dir = Path(__file__).resolve().parent.parent
 
-        self.path_processed_frame_log = self.parent_dir / "logs" / "processed_frame_log.txt"
-        if not self.path_processed_frame_log.exists():
-            self.path_processed_frame_log.touch()
-
-        self.path_processing_video_frame_log = self.parent_dir / "logs" / "processing_video_frame_log.txt"
-        if not self.path_processing_video_frame_log.exists():
-            self.path_processing_video_frame_log.touch()
+        # queue-backed JSON-lines log, per-frame records only at INGEST_LOG_LEVEL=frame
+        self.log = IngestionLogSink()
 
         self.path_visual_onnx = self.parent_dir / "onnx" / "visual.onnx"
 
-        self.path_chromadb = self.parent_dir / "chromaDB"
+        self.path_chromadb = Path(os.getenv("CHROMA_DB_PATH", self.parent_dir / "chromaDB"))
+
+        # write into the version the API is serving when DbManager has switched to versioned directories
+        current_file = self.path_chromadb / "CURRENT"
+        if current_file.exists() and (self.path_chromadb / "versions" / current_file.read_text().strip()).exists():
+            self.path_chromadb = self.path_chromadb / "versions" / current_file.read_text().strip()
 
 
         # initialize onnx
         providers = ['DmlExecutionProvider']
 
-        self.session = ort.InferenceSession(self.path_visual_onnx, providers = providers)
+        self.embedder = ClipEmbedder(self.path_visual_onnx, providers = providers)
 
-        self.clipProcessor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch16")
+        self.session = self.embedder.session
+
+        self.sampler = FrameSampler()
 
         print("Active ONNX Providers:", self.session.get_providers())
 
-        with open(self.path_processed_frame_log, "a", encoding="utf-8") as log_file:
-            log_file.write(f"Input name: {self.session.get_inputs()[0].name} :: at logtime:: {datetime.now()}\n")
+        self.log.run("session_loaded", input_name=self.embedder.input_name, providers=self.session.get_providers())
 
 
         # initialize chromadb
@@ -52,86 +54,84 @@ class ProcessTrailers:
 
         self.collection = chromaClient.get_or_create_collection(name="moviesTrailerEmbeddings")
 
+        # one vector per scene with its time range, next to the per-trailer mean
+        self.scene_collection = None
+        if os.getenv("SCENE_INDEX", "false").lower() in ("1", "true", "yes"):
+            self.scene_collection = chromaClient.get_or_create_collection(name="moviesTrailerScenes")
 
+        self.frame_store = FrameStore() if os.getenv("FRAME_STORE", "false").lower() in ("1", "true", "yes") else None
 
+        self.manifest = IngestionManifest()
 
-    def extractFrames(self, videoPath, numFrames=int(os.getenv("NUMBER_OF_FRAMES", 100))):
 
-        cap = cv2.VideoCapture(videoPath)
-        totalFrames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
 
-        if totalFrames < numFrames:
-            frameIds = list(range(totalFrames))
-        else:
-            step = totalFrames // numFrames
-            frameIds = [i * step for i in range(numFrames)]
 
+    def extractFrames(self, videoPath):
 
-        frames = []
+        on_frame = None
 
-        for frameId in frameIds:
+        if self.log.enabled("frame"):
+            def on_frame(frameId, success):
+                self.log.frame("frame_read" if success else "frame_failed", path=str(videoPath), frame=frameId)
 
-            cap.set(cv2.CAP_PROP_POS_FRAMES, frameId)
+        for _, _, frame in self.sampler.sample(videoPath, on_frame=on_frame):
+            yield frame
 
-            success, frame = cap.read()
 
-            if success:
-                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
 
-                frames.append(Image.fromarray(frame))
+    def getClipEmbedding(self, frames):
 
-                with open(self.path_processed_frame_log, "a", encoding="utf-8") as log_file:
-                    log_file.write(f"✅successfully read frame {frameId} from {videoPath}\n")
+        return self.embedder.embed_frames(frames)
 
-                print(f"✅successfully read frame {frameId} from {videoPath}")
-            else:
-                with open(self.path_processed_frame_log, "a", encoding="utf-8") as log_file:
-                    log_file.write(f"❌Failed to read frame {frameId} from {videoPath}\n")
 
-                print(f"❌Failed to read frame {frameId} from {videoPath}")
-                continue
 
-        cap.release()
+    def process_extracted_frames(self, tconst, path):
 
-        return frames
+        vector = self.getClipEmbedding(self.extractFrames(path))
 
+        if vector is None:
+            self.log_failed(tconst, path, "no frames could be read")
+            return
 
+        # vector
 
-    def getClipEmbedding(self, frames):
+        self.collection.upsert( documents = [f"Trailer for {tconst}"],
+                        embeddings = [vector],
+                        ids = [tconst],
+                        metadatas = [{"filename": path}]
+                        )
 
-        inputs = self.clipProcessor(images = frames, return_tensors = "pt", padding = True)["pixel_values"].numpy()
+        self.log_stored(tconst, path)
 
-        outputs = self.session.run(None, {"input": inputs})
 
-        embeddings = outputs[0]
-        
-        embeddings = embeddings / np.linalg.norm(embeddings, axis =- 1, keepdims = True)
 
-        return embeddings.mean(axis = 0)
+    def log_stored(self, tconst, path, frame_count=None):
 
+        if frame_count is not None:
+            self.manifest.mark_embedded(tconst, frame_count)
 
+        self.log.trailer("stored", tconst=tconst, path=str(path), frames=frame_count)
 
-    def process_extracted_frames(self, tconst, path):
 
-        frames = self.extractFrames(path)
 
-        if not frames:
-            with open(self.path_processing_video_frame_log, "a", encoding="utf-8") as log_file:
-                log_file.write(f"❌Failed to extract frame for {tconst} from path: {path}\n")
-            return
+    def log_failed(self, tconst, path, reason):
 
-        vector = self.getClipEmbedding(frames)
+        self.manifest.mark_failed(tconst, reason)
+
+        self.log.trailer("failed", tconst=tconst, path=str(path), reason=str(reason))
 
-        # vector
 
-        self.collection.add( documents = [f"Trailer for {tconst}"],
-                        embeddings = [vector],
-                        ids = [tconst],
-                        metadatas = [{"filename": path}]
-                        )
 
-        with open(self.path_processing_video_frame_log, "a", encoding="utf-8") as log_file:
-            log_file.write(f"✅stored embedding for {tconst} from path: {path}\n")
+    def model_version(self):
+
+        # a new model or a different frame sampling both produce different vectors
+        version = os.getenv("MODEL_VERSION") or f"{self.embedder.model_hash}:{self.sampler.describe()}"
+
+        # turning the scene index on (or re-tuning it) has to revisit trailers that only have a mean vector
+        if self.scene_collection is not None:
+            version += f":{SceneSegmenter().describe()}"
+
+        return version
 
 
 
@@ -142,13 +142,45 @@ class ProcessTrailers:
 
         aboutToProcessTrailers = [f for f in os.listdir(trailerDirectory) if f.endswith(".mp4")][0:]
 
-        for file in tqdm(aboutToProcessTrailers):
+        trailers = [(file.replace(".mp4", ""), os.path.join(trailerDirectory, file)) for file in aboutToProcessTrailers]
+
+        # one bulk existence check against the collection instead of a lookup per file
+        existing_ids = set(self.collection.get(ids=[tconst for tconst, _ in trailers], include=[])["ids"]) if trailers else set()
+
+        model_version = self.model_version()
+
+        # trailers embedded before the frame store was switched on count as missing until their frames are stored
+        if self.frame_store is not None:
+            frame_version = f"{self.embedder.model_hash}:{self.sampler.describe()}"
+            existing_ids &= {entry["tconst"] for entry in self.frame_store.entries(frame_version)}
+
+        to_embed, skipped = self.manifest.plan(trailers, existing_ids, model_version)
+
+        print(f"⏭️Skipping {skipped} unchanged trailers, embedding {len(to_embed)} (model version {model_version})")
+
+        self.log.run("ingestion_started", to_embed=len(to_embed), skipped=skipped, model_version=model_version)
+
+        # decode, inference and chroma writes run as overlapping stages instead of one trailer at a time
+        on_frame = None
+
+        if self.log.enabled("frame"):
+            def on_frame(tconst, frameId, success):
+                self.log.frame("frame_read" if success else "frame_failed", tconst=tconst, frame=frameId)
 
-                tconst = file.replace(".mp4", "")
+        pipeline = IngestionPipeline(self.embedder, self.sampler, self.collection,
+                                     on_stored=self.log_stored, on_failed=self.log_failed, on_frame=on_frame,
+                                     scene_collection=self.scene_collection, frame_store=self.frame_store)
 
-                filePath = os.path.join(trailerDirectory, file)
+        def items():
+            for tconst, path, stat, content_hash in tqdm(to_embed):
+                # recorded before the work starts, so a crash leaves it pending and the next run picks it up
+                self.manifest.mark_pending(tconst, path, stat, content_hash, model_version)
+                yield tconst, path
 
-                self.process_extracted_frames(tconst, filePath)
+        summary = pipeline.run(items())
 
+        self.log.run("ingestion_finished", **summary)
 
+        self.log.flush()
 
+        print(f"✅Ingestion finished: {summary}")
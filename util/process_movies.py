@@ -1,12 +1,12 @@
-import time
 import os
-import requests
-import winsound
+import asyncio
 import pandas as pd
 from pathlib import Path
 from dotenv import load_dotenv
 from env_manager import envManager
-from downLoad_Trailer import downloadTrailer
+from tmdb_client import TmdbLookupEngine
+from tmdb_cache import TmdbCache
+from checkpoint_store import CheckpointStore, LeaseHeartbeat, default_worker_id, LOOKUP_FINISHED_STATES
 
 # Load environment variables
 
@@ -54,8 +54,8 @@ class ProcessMovies:
         if not self.API_KEY:
             raise ValueError("TMDB_API_KEY is not set in the environment variables.")
 
-        self.TMDB_SEARCH_URL = "https://api.themoviedb.org/3/find/{tconst}"
-        self.TMDB_VIDEO_URL = "https://api.themoviedb.org/3/movie/{tmdb_id}/videos"
+        # persistent tconst -> movie and tmdb_id -> trailer answers, including "not found"
+        self.cache = TmdbCache()
 
         # index range
         self.START_INDEX = int(os.getenv("START_INDEX"))
@@ -63,123 +63,86 @@ class ProcessMovies:
 
 
 
-    # Get movie details using IMDb ID
-    def get_tmdb_movie_by_imdb_id(self, tconst):
+    async def lookup_trailers(self, tconsts):
 
-        message = f"========❌❌❌ No internet connection available at the moment while fetching for tconst {tconst},"
-        downloadTrailer.retry_on_no_internet_access(message)
-        print("✅✅✅Internet connection available, proceeding...")
-
-        url = self.TMDB_SEARCH_URL.format(tconst=tconst)
-
-        params = {
-            "api_key": self.API_KEY,
-            "external_source": "imdb_id"
-        }
+        engine = TmdbLookupEngine(self.API_KEY, cache=self.cache)
 
         try:
-            response = requests.get(url, params=params)
-
-            response.raise_for_status()
-
-            results = response.json().get("movie_results", [])
-            
-            return results[0] if results else None
-        
-        except Exception as e:
-
-            print(f"Error fetching TMDb movie for {tconst}: {e}")
-
-            return None
-
+            return await engine.lookup_many(tconsts)
+        finally:
+            print(f"📊 TMDb lookup stats: {engine.stats}, cache: {self.cache.stats}")
+            await engine.aclose()
 
 
-    def get_trailer_url(self, tmdb_id):
 
-        message = f"========❌❌❌ No internet connection available while fetching TMDb ID {tmdb_id}"
-        downloadTrailer.retry_on_no_internet_access(message)
-        print("✅✅✅ Internet connection available, proceeding...")
+    def select_rows(self):
 
-        url = self.TMDB_VIDEO_URL.format(tmdb_id=tmdb_id)
-        params = {"api_key": self.API_KEY}
-
-        try:
-            response = requests.get(url, params=params)
+        # (index, tconst, title, year) for every movie in the current range with a usable year
+        subset = self.movies.iloc[self.START_INDEX:self.END_INDEX]
 
-            # to handle rate limiting
-            MAX_RETRY_WAIT = 60
+        rows = []
+        for index, row in subset.iterrows():
 
-            if response.status_code == 429:
-                retry_after = int(response.headers.get("Retry-After", 30))
+            title = row["primaryTitle"]
+            year = row["startYear"]
+            tconst = row["tconst"]
 
-                if retry_after > MAX_RETRY_WAIT:
-                    print(f"⛔ Retry-After too long ({retry_after}s). Skipping TMDb ID {tmdb_id}")
-                    winsound.PlaySound(f"Skipping TMDB ID {tmdb_id}, because Api Rate Limit has been hit and Retry-After is {retry_after}s which is too long", winsound.SND_ALIAS)
 
-                    #log in a file
-                    with open(self.skipped_path, "a") as log_file:
-                        log_file.write(f"{tmdb_id}, because Retry-After is {retry_after}s which is too long\n")
-                    return False
-
-                print(f"⏳ TMDb rate limit hit for ID {tmdb_id}. Retrying after {retry_after}s")
-                winsound.PlaySound(f"Api's Rate Limit has been hit. Retrying TMDB ID {tmdb_id} after {retry_after}s", winsound.SND_ALIAS)
-                time.sleep(retry_after)
-                return self.get_trailer_url(tmdb_id)
+            if year == "\\N" or not str(year).isdigit():
 
-            for video in response.json().get("results", []):
-                if video["type"] == "Trailer" and video["site"] == "YouTube":
-                    return f"https://www.youtube.com/watch?v={video['key']}"
+                with open(self.path, "a") as log_file:
+                    log_file.write(f"{tconst}, {title}, {year}, Skipped (invalid year)\n")
+                continue
 
-        except Exception as e:
-            print(f"❌ Error fetching trailer for TMDb ID {tmdb_id}: {e}")
+            rows.append((index, tconst, title, year))
 
-        return None
+        return rows
 
 
 
-    def process_movies(self, target_num_of_trailers=100, header=True):
+    def lookup_rows(self, rows):
 
-        # store fetched trailers
+        # returns the found trailers and a per-tconst status for checkpointing
         results = []
+        statuses = {}
 
-        subset = self.movies.iloc[self.START_INDEX:self.END_INDEX]
+        # all lookups for the range run concurrently, paced by one shared rate limiter
+        lookups = asyncio.run(self.lookup_trailers([tconst for _, tconst, _, _ in rows]))
 
         # Process and fetch trailer for each movie
-        for index, row in subset.iterrows():
-
-            title = row["primaryTitle"]
-            year = row["startYear"]
-            tconst = row["tconst"]
-
-
-            if year == "\\N" or not str(year).isdigit():
+        for (index, tconst, title, year), (movie, trailer_url) in zip(rows, lookups):
 
-                with open(self.path, "a") as log_file:
-                    log_file.write(f"{tconst}, {title}, {year}, Skipped (invalid year)\n")
+            # logs to file if movie details were not found
+            if movie is False:
+                with open(self.skipped_path, "a") as log_file:
+                    log_file.write(f"{tconst}, because TMDb rate limit Retry-After was too long\n")
+                statuses[tconst] = "rate_limited"
                 continue
 
-
-            # fetches movie details and logs to file if not found
-            movie = self.get_tmdb_movie_by_imdb_id(tconst)
             if not movie:
 
                 print(f"[{index + 1}/{len(self.movies)}] {title} ({year}): Movie not found")
 
                 with open(self.path, "a") as log_file:
                     log_file.write(f"[{index + 1}/{len(self.movies)}] {tconst}, {title}, {year}, Movie not found\n")
+                statuses[tconst] = "movie_not_found"
                 continue
 
 
-            # uses movieId in movie details to fetch trailer and logs to file if not found
-            trailer_url = self.get_trailer_url(movie["id"])
+            # logs to file if no trailer was found for the movie
             if not trailer_url:
 
                 print(f"[{index + 1}/{len(self.movies)}] {title} ({year}): Trailer not found")
 
-                if trailer_url != False:
+                if trailer_url is False:
+                    with open(self.skipped_path, "a") as log_file:
+                        log_file.write(f"{movie['id']}, because TMDb rate limit Retry-After was too long\n")
+                    statuses[tconst] = "rate_limited"
+                else:
                     with open(self.path, "a") as log_file:
                         log_file.write(f"[{index + 1}/{len(self.movies)}] {tconst}, {title}, {year}, Trailer not found\n")
-                    continue
+                    statuses[tconst] = "no_trailer"
+                continue
 
             print(f"[{index + 1}/{len(self.movies)}] {title} ({year}): {trailer_url}")
 
@@ -194,8 +157,16 @@ class ProcessMovies:
                 "trailer_url": trailer_url
             })
 
-            # Sleep to avoid throttling
-            time.sleep(0.5)
+            statuses[tconst] = ("trailer_found", trailer_url)
+
+        return results, statuses
+
+
+
+    def process_movies(self, target_num_of_trailers=100, header=True):
+
+        # store fetched trailers
+        results, _ = self.lookup_rows(self.select_rows())
 
 
         # Save to CSV
@@ -217,6 +188,54 @@ class ProcessMovies:
 
 
 
+
+    def process_movies_leased(self, worker_id=None, range_size=None, store=None, on_results=None):
+
+        # leases ranges of the catalog from the checkpoint store, so several workers can share it safely;
+        # on_results gets each range's found trailers (the download stage) before the range is marked done
+        store = store or CheckpointStore()
+        worker_id = worker_id or default_worker_id()
+        range_size = int(range_size or os.getenv("CHECKPOINT_RANGE_SIZE", 100))
+
+        store.seed_ranges(len(self.movies), range_size)
+
+        while (leased := store.lease_range(worker_id)) is not None:
+
+            start, stop = leased
+            self.START_INDEX, self.END_INDEX = start, stop
+
+            heartbeat = LeaseHeartbeat(store, start, worker_id).start()
+
+            try:
+                rows = self.select_rows()
+
+                # a range picked up after a crash only redoes the titles that never finished
+                finished = store.finished_items([tconst for _, tconst, _, _ in rows], LOOKUP_FINISHED_STATES)
+                rows = [row for row in rows if row[1] not in finished]
+
+                results, statuses = self.lookup_rows(rows)
+
+                if on_results is not None and results:
+                    on_results(results)
+
+                # found trailers are recorded only once handed on, so a crash before that looks them up again
+                for tconst, status in statuses.items():
+                    store.record_item(start, tconst, status)
+
+            except Exception:
+                heartbeat.stop()
+                store.release_range(start, worker_id)
+                raise
+
+            heartbeat.stop()
+
+            if not store.complete_range(start, worker_id):
+                print(f"⚠️ Lease on range {start}-{stop} expired before it finished, another worker owns it now")
+
+            print(f"✅ Range {start}-{stop} done: {store.progress()}")
+
+
+
 # processMovies = ProcessMovies()
 
 
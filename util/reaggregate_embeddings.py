@@ -0,0 +1,143 @@
+import os
+import time
+import argparse
+import numpy as np
+from pathlib import Path
+from dotenv import load_dotenv
+from chromadb import PersistentClient
+from frame_store import FrameStore
+from scene_segmenter import SceneSegmenter
+from chroma_write_buffer import ChromaWriteBuffer
+from ingestion_manifest import IngestionManifest
+
+# usage: python reaggregate_embeddings.py [--pooling mean|trimmed] [--frames N] [--scenes] [--collection NAME]
+
+parent_dir = Path(__file__).resolve().parent.parent
+
+
+def chroma_db_path():
+
+    path = Path(os.getenv("CHROMA_DB_PATH", parent_dir / "chromaDB"))
+
+    current_file = path / "CURRENT"
+    if current_file.exists() and (path / "versions" / current_file.read_text().strip()).exists():
+        path = path / "versions" / current_file.read_text().strip()
+
+    return path
+
+
+def select_frames(timestamps, embeddings, num_frames):
+
+    # evenly spaced subset, the same spread NUMBER_OF_FRAMES gives when sampling a video
+    if not num_frames or num_frames >= len(timestamps):
+        return timestamps, embeddings
+
+    rows = np.linspace(0, len(timestamps) - 1, num_frames).round().astype(np.int64)
+    return timestamps[rows], embeddings[rows]
+
+
+def pool(embeddings, pooling, trim):
+
+    if pooling == "mean":
+        # identical to ClipEmbedder.embed_frames, so a rebuild with the stored frames reproduces ingestion
+        return embeddings.mean(axis=0)
+
+    # trimmed: drop the frames least like the trailer as a whole (title cards, black frames) before averaging
+    mean = embeddings.mean(axis=0)
+    similarity = embeddings @ (mean / (np.linalg.norm(mean) or 1.0))
+
+    keep = max(1, int(round(len(embeddings) * (1.0 - trim))))
+    return embeddings[np.argsort(-similarity)[:keep]].mean(axis=0)
+
+
+def reaggregate(pooling="mean", trim=0.1, num_frames=None, scenes=False, collection_name=None, frame_version=None,
+                model_version=None):
+
+    store = FrameStore()
+    client = PersistentClient(str(chroma_db_path()))
+
+    trailer_buffer = ChromaWriteBuffer(client.get_or_create_collection(name=collection_name or "moviesTrailerEmbeddings"))
+
+    scene_collection = client.get_or_create_collection(name="moviesTrailerScenes") if scenes else None
+    scene_buffer = ChromaWriteBuffer(scene_collection) if scenes else None
+    segmenter = SceneSegmenter() if scenes else None
+
+    # trailers whose old scenes are cleared in one bulk delete right before the scene upserts flush
+    scene_deletes = set()
+
+    def flush_scenes():
+        if scene_deletes:
+            scene_collection.delete(where={"tconst": {"$in": sorted(scene_deletes)}})
+            scene_deletes.clear()
+
+        scene_buffer.flush()
+
+    entries = store.entries(frame_version)
+    rebuilt = []
+
+    print(f"🔁 Re-aggregating {len(entries)} trailers ({pooling}, frames={num_frames or 'all'}, scenes={scenes})")
+    started = time.perf_counter()
+
+    for entry in entries:
+
+        tconst = entry["tconst"]
+
+        try:
+            timestamps, embeddings = store.get(tconst)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Skipping {tconst}: {e}")
+            continue
+
+        timestamps, embeddings = select_frames(timestamps, np.asarray(embeddings, dtype=np.float32), num_frames)
+
+        if len(embeddings) == 0:
+            continue
+
+        trailer_buffer.add(tconst, pool(embeddings, pooling, trim).astype(np.float32), f"Trailer for {tconst}",
+                           {"filename": entry["path"]})
+
+        if scenes:
+            scene_deletes.add(tconst)
+
+            for i, (start, end, vector) in enumerate(segmenter.segment(timestamps, embeddings)):
+                scene_buffer.add(f"{tconst}:{i:04d}", vector, f"Scene {i} of {tconst}",
+                                 {"tconst": tconst, "start": start, "end": end, "filename": entry["path"]})
+
+            if scene_buffer.is_due():
+                flush_scenes()
+
+        rebuilt.append(tconst)
+
+        if trailer_buffer.is_due():
+            trailer_buffer.flush()
+
+    trailer_buffer.flush()
+    if scenes:
+        flush_scenes()
+
+    # lets the next ingestion run treat these trailers as current instead of decoding them again
+    if model_version:
+        manifest = IngestionManifest()
+        manifest.set_model_version(rebuilt, model_version)
+        manifest.close()
+
+    store.close()
+
+    print(f"✅ Rebuilt {len(rebuilt)} trailers in {time.perf_counter() - started:.1f}s, writes {trailer_buffer.stats()}")
+
+
+if __name__ == "__main__":
+
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Rebuild trailer (and scene) vectors from stored per-frame embeddings.")
+    parser.add_argument("--pooling", choices=("mean", "trimmed"), default="mean")
+    parser.add_argument("--trim", type=float, default=0.1, help="fraction of outlying frames dropped by --pooling trimmed")
+    parser.add_argument("--frames", type=int, default=None, help="use an evenly spaced subset of this many stored frames")
+    parser.add_argument("--scenes", action="store_true", help="also rebuild the scene collection")
+    parser.add_argument("--collection", default=None, help="write trailer vectors to another collection, e.g. for an A/B index")
+    parser.add_argument("--frame-version", default=None, help="only use frames stored by this model/sampling version")
+    parser.add_argument("--model-version", default=None, help="record this model version in the ingestion manifest for rebuilt trailers")
+    args = parser.parse_args()
+
+    reaggregate(args.pooling, args.trim, args.frames, args.scenes, args.collection, args.frame_version, args.model_version)
@@ -0,0 +1,73 @@
+import os
+import numpy as np
+
+
+class SceneSegmenter:
+
+    # splits a trailer's frame embeddings into scenes wherever consecutive frames stop looking alike
+
+    def __init__(self, threshold=None, max_seconds=None, min_frames=None):
+
+        self.threshold = float(threshold or os.getenv("SCENE_SPLIT_THRESHOLD", 0.85))
+
+        # long single shots are still cut up, so one scene never stands for half a trailer
+        self.max_seconds = float(max_seconds or os.getenv("SCENE_MAX_SECONDS", 10))
+
+        self.min_frames = int(min_frames or os.getenv("SCENE_MIN_FRAMES", 1))
+
+
+
+    def describe(self):
+
+        return f"scenes{self.threshold:g}/{self.max_seconds:g}s/{self.min_frames}"
+
+
+
+    def boundaries(self, timestamps, embeddings):
+
+        # cosine similarity of each frame with the one before it; rows are already unit length
+        similarity = np.einsum("ij,ij->i", embeddings[1:], embeddings[:-1])
+
+        cuts = [0, *(np.flatnonzero(similarity < self.threshold) + 1).tolist(), len(timestamps)]
+
+        # cut again inside anything longer than max_seconds, and fold scenes below min_frames into their neighbour
+        bounds = []
+        for start, stop in zip(cuts[:-1], cuts[1:]):
+            while start < stop:
+                end = start + 1
+                while end < stop and timestamps[end] - timestamps[start] < self.max_seconds:
+                    end += 1
+
+                if bounds and end - start < self.min_frames:
+                    bounds[-1] = (bounds[-1][0], end)
+                else:
+                    bounds.append((start, end))
+
+                start = end
+
+        return bounds
+
+
+
+    def segment(self, timestamps, embeddings):
+
+        # returns (start_seconds, end_seconds, unit vector) per scene
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+
+        if len(timestamps) == 0:
+            return []
+
+        # a scene ends where the next sampled frame begins, the last one one sampling step after its last frame
+        step = float(np.median(np.diff(timestamps))) if len(timestamps) > 1 else 0.0
+
+        scenes = []
+        for start, stop in self.boundaries(timestamps, embeddings):
+            vector = embeddings[start:stop].astype(np.float64).mean(axis=0)
+            vector /= np.linalg.norm(vector) or 1.0
+
+            end_time = timestamps[stop] if stop < len(timestamps) else timestamps[stop - 1] + step
+
+            scenes.append((float(timestamps[start]), float(end_time), vector.astype(np.float32)))
+
+        return scenes
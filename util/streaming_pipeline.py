@@ -0,0 +1,251 @@
+import os
+import time
+import queue
+import asyncio
+import threading
+import numpy as np
+from tmdb_client import TmdbLookupEngine
+from ingestion_pipeline import IngestionPipeline
+from download_scheduler import DownloadScheduler, YtDlpDownloader
+
+# end-of-stream marker for the download queue
+STOP = object()
+
+
+class StreamingIngestion:
+
+    # lookup -> download -> decode -> embed -> write, with every movie moving through on its own
+
+    def __init__(self, process_movies, download_trailers, process_trailers, downloader=None,
+                 download_workers=None, queue_size=None, progress_interval=None, on_outcome=None):
+
+        self.process_movies = process_movies
+        self.process_trailers = process_trailers
+
+        self.downloader = downloader or YtDlpDownloader(download_trailers.ydl_opts)
+
+        self.scheduler = DownloadScheduler(self.downloader, download_trailers.trailers_dir)
+
+        self.download_workers = int(download_workers or os.getenv("STREAM_DOWNLOAD_WORKERS", self.scheduler.max_workers))
+
+        self.download_queue = queue.Queue(maxsize=int(queue_size or os.getenv("STREAM_QUEUE_SIZE", 64)))
+
+        self.progress_interval = float(progress_interval or os.getenv("STREAM_PROGRESS_INTERVAL", 10))
+
+        self.metrics_lock = threading.Lock()
+        self.timeline = {}
+        self.counts = {"movies": 0, "looked_up": 0, "no_trailer": 0, "downloaded": 0, "download_failed": 0,
+                       "up_to_date": 0, "stored": 0, "embed_failed": 0}
+
+        self.started_at = None
+        self.first_indexed_at = None
+
+        # final state per tconst, what a checkpoint store records for the range; on_outcome(tconst, outcome)
+        # is called as each one lands, from whichever stage thread finished it
+        self.outcomes = {}
+        self.on_outcome = on_outcome
+
+
+
+    def _mark(self, tconst, stage, count=None, outcome=None):
+
+        with self.metrics_lock:
+            self.timeline.setdefault(tconst, {})[stage] = time.perf_counter()
+            if count is not None:
+                self.counts[count] += 1
+            if outcome is not None:
+                self.outcomes[tconst] = outcome
+
+        if outcome is not None and self.on_outcome is not None:
+            self.on_outcome(tconst, outcome)
+
+
+
+    async def _lookup_stage(self, rows):
+
+        engine = TmdbLookupEngine(self.process_movies.API_KEY, cache=self.process_movies.cache)
+        loop = asyncio.get_running_loop()
+
+        async def lookup_one(tconst):
+            self._mark(tconst, "queued")
+
+            movie, trailer_url = await engine.lookup(tconst)
+
+            if not movie or not trailer_url:
+                skipped = movie is False or trailer_url is False
+                self._mark(tconst, "looked_up", "no_trailer", "rate_limited" if skipped else "movie_not_found" if not movie else "no_trailer")
+                self.process_trailers.log.trailer("no_trailer", tconst=tconst, skipped=skipped)
+                return
+
+            self._mark(tconst, "looked_up", "looked_up")
+
+            # hand over as soon as this one movie resolves; blocks (off the loop) when downloads fall behind
+            await loop.run_in_executor(None, self.download_queue.put, (tconst, trailer_url))
+
+        try:
+            await asyncio.gather(*(lookup_one(tconst) for _, tconst, _, _ in rows))
+        finally:
+            await engine.aclose()
+
+
+
+    def _download_worker(self, pipeline, existing_ids, model_version):
+
+        manifest = self.process_trailers.manifest
+
+        while True:
+
+            item = self.download_queue.get()
+            if item is STOP:
+                return
+
+            tconst, url = item
+            path = None
+
+            # one bad item must not end the worker, or every item queued behind it would stall
+            try:
+                result = self.scheduler.download_one(tconst, url)
+
+                if not result["file_path"]:
+                    self._mark(tconst, "downloaded", "download_failed", "download_failed")
+                    self.process_trailers.log.trailer("download_failed", tconst=tconst, url=url, error=result["error"])
+                    continue
+
+                self._mark(tconst, "downloaded", "downloaded")
+
+                path = result["file_path"]
+
+                to_embed, _ = manifest.plan([(tconst, path)], existing_ids, model_version)
+
+                if not to_embed:
+                    self._mark(tconst, "stored", "up_to_date", "up_to_date")
+                    continue
+
+                _, _, stat, content_hash = to_embed[0]
+                manifest.mark_pending(tconst, path, stat, content_hash, model_version)
+
+                pipeline.submit(tconst, path)
+
+            except Exception as e:
+                if path is None:
+                    self._mark(tconst, "downloaded", "download_failed", "download_failed")
+                    self.process_trailers.log.trailer("download_failed", tconst=tconst, url=url, error=str(e))
+                else:
+                    self._on_failed(tconst, path, str(e))
+
+
+
+    def _on_stored(self, tconst, path, frame_count):
+
+        self.process_trailers.log_stored(tconst, path, frame_count)
+
+        self._mark(tconst, "stored", "stored", "stored")
+
+        with self.metrics_lock:
+            if self.first_indexed_at is None:
+                self.first_indexed_at = time.perf_counter()
+                print(f"🚀 First trailer indexed after {self.first_indexed_at - self.started_at:.1f}s ({tconst})")
+
+
+
+    def _on_failed(self, tconst, path, reason):
+
+        self.process_trailers.log_failed(tconst, path, reason)
+
+        self._mark(tconst, "failed", "embed_failed", ("embed_failed", reason))
+
+
+
+    def _report_progress(self, stop_event):
+
+        while not stop_event.wait(self.progress_interval):
+            with self.metrics_lock:
+                counts = dict(self.counts)
+
+            elapsed = time.perf_counter() - self.started_at
+            print(f"📊 {elapsed:.0f}s {counts}")
+
+
+
+    def _latency_summary(self):
+
+        def percentiles(values):
+            if not values:
+                return {}
+
+            values = np.array(values)
+            return {"p50": round(float(np.percentile(values, 50)), 2), "p95": round(float(np.percentile(values, 95)), 2),
+                    "max": round(float(values.max()), 2)}
+
+        stages = {"lookup": ("queued", "looked_up"), "download": ("looked_up", "downloaded"),
+                  "embed": ("downloaded", "stored"), "end_to_end": ("queued", "stored")}
+
+        with self.metrics_lock:
+            timelines = list(self.timeline.values())
+
+        return {
+            name: percentiles([t[end] - t[start] for t in timelines if start in t and end in t])
+            for name, (start, end) in stages.items()
+        }
+
+
+
+    def run(self, rows=None):
+
+        rows = rows if rows is not None else self.process_movies.select_rows()
+
+        self.started_at = time.perf_counter()
+        self.counts["movies"] = len(rows)
+
+        collection = self.process_trailers.collection
+        tconsts = [tconst for _, tconst, _, _ in rows]
+
+        # one bulk existence check up front, as in batch ingestion
+        existing_ids = set(collection.get(ids=tconsts, include=[])["ids"]) if tconsts else set()
+        model_version = self.process_trailers.model_version()
+
+        pipeline = IngestionPipeline(self.process_trailers.embedder, self.process_trailers.sampler, collection,
+                                     on_stored=self._on_stored, on_failed=self._on_failed,
+                                     scene_collection=self.process_trailers.scene_collection,
+                                     frame_store=self.process_trailers.frame_store)
+        pipeline.start()
+
+        download_threads = [
+            threading.Thread(target=self._download_worker, args=(pipeline, existing_ids, model_version), name=f"stream-download-{i}", daemon=True)
+            for i in range(self.download_workers)
+        ]
+        for thread in download_threads:
+            thread.start()
+
+        stop_progress = threading.Event()
+        progress_thread = threading.Thread(target=self._report_progress, args=(stop_progress,), daemon=True)
+        progress_thread.start()
+
+        try:
+            asyncio.run(self._lookup_stage(rows))
+
+        finally:
+            for _ in download_threads:
+                self.download_queue.put(STOP)
+            for thread in download_threads:
+                thread.join()
+
+            ingestion = pipeline.close()
+
+            stop_progress.set()
+            progress_thread.join()
+
+        elapsed = time.perf_counter() - self.started_at
+
+        summary = {
+            **self.counts,
+            "elapsed_seconds": round(elapsed, 2),
+            "time_to_first_indexed_seconds": round(self.first_indexed_at - self.started_at, 2) if self.first_indexed_at else None,
+            "latency_seconds": self._latency_summary(),
+            "ingestion": ingestion,
+        }
+
+        self.process_trailers.log.run("streaming_finished", **summary)
+        self.process_trailers.log.flush()
+
+        return summary
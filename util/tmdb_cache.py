@@ -0,0 +1,189 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import sqlite3
+import threading
+import pandas as pd
+from pathlib import Path
+from dotenv import load_dotenv
+
+
+parent_dir = Path(__file__).resolve().parent.parent
+
+path_tmdb_cache = parent_dir / "Data" / "tmdb_cache.sqlite3"
+
+DAY = 24 * 60 * 60
+
+# SQLite caps bound parameters per statement, lookups by many keys go in chunks
+SQL_CHUNK_SIZE = 900
+
+
+class TmdbCache:
+
+    def __init__(self, path=None, ttl_days=None, negative_ttl_days=None):
+
+        self.path = Path(path or os.getenv("TMDB_CACHE_PATH", path_tmdb_cache))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self.ttl = float(ttl_days or os.getenv("TMDB_CACHE_TTL_DAYS", 30)) * DAY
+
+        # "not found" answers expire sooner, TMDb keeps adding titles and trailers
+        self.negative_ttl = float(negative_ttl_days or os.getenv("TMDB_CACHE_NEGATIVE_TTL_DAYS", 7)) * DAY
+
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+
+        self.stats = {"hits": 0, "misses": 0}
+
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS movies (
+                    tconst TEXT PRIMARY KEY,
+                    payload TEXT,
+                    expires_at REAL NOT NULL
+                )
+            """)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS trailers (
+                    tmdb_id INTEGER PRIMARY KEY,
+                    url TEXT,
+                    expires_at REAL NOT NULL
+                )
+            """)
+
+
+
+    def _get(self, sql, key):
+
+        with self.lock:
+            row = self.conn.execute(sql, (key, time.time())).fetchone()
+
+        self.stats["hits" if row is not None else "misses"] += 1
+
+        return row
+
+
+
+    def _expiry(self, value):
+
+        return time.time() + (self.ttl if value else self.negative_ttl)
+
+
+
+    def get_movie(self, tconst):
+
+        # (hit, movie): a hit with movie None is a cached "not found"
+        row = self._get("SELECT payload FROM movies WHERE tconst = ? AND expires_at > ?", tconst)
+
+        if row is None:
+            return False, None
+
+        return True, json.loads(row[0]) if row[0] is not None else None
+
+
+
+    def put_movie(self, tconst, movie):
+
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO movies (tconst, payload, expires_at) VALUES (?, ?, ?)",
+                (tconst, json.dumps(movie) if movie else None, self._expiry(movie)),
+            )
+
+
+
+    def get_trailer(self, tmdb_id):
+
+        row = self._get("SELECT url FROM trailers WHERE tmdb_id = ? AND expires_at > ?", tmdb_id)
+
+        if row is None:
+            return False, None
+
+        return True, row[0]
+
+
+
+    def put_trailer(self, tmdb_id, url):
+
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO trailers (tmdb_id, url, expires_at) VALUES (?, ?, ?)",
+                (tmdb_id, url, self._expiry(url)),
+            )
+
+
+
+    def cached_tconsts(self, tconsts):
+
+        tconsts = list(tconsts)
+        found = set()
+
+        with self.lock:
+            for start in range(0, len(tconsts), SQL_CHUNK_SIZE):
+                chunk = tconsts[start:start + SQL_CHUNK_SIZE]
+                placeholders = ",".join("?" * len(chunk))
+
+                rows = self.conn.execute(
+                    f"SELECT tconst FROM movies WHERE tconst IN ({placeholders}) AND expires_at > ?",
+                    (*chunk, time.time()),
+                ).fetchall()
+
+                found.update(row[0] for row in rows)
+
+        return found
+
+
+
+    def purge_expired(self):
+
+        now = time.time()
+
+        with self.lock, self.conn:
+            removed = self.conn.execute("DELETE FROM movies WHERE expires_at <= ?", (now,)).rowcount
+            removed += self.conn.execute("DELETE FROM trailers WHERE expires_at <= ?", (now,)).rowcount
+
+        return removed
+
+
+
+    def close(self):
+
+        with self.lock:
+            self.conn.close()
+
+
+async def warm_from_csv(csv_path, cache=None):
+
+    from tmdb_client import TmdbLookupEngine
+
+    cache = cache or TmdbCache()
+
+    tconsts = pd.read_csv(csv_path, usecols=["tconst"])["tconst"].dropna().astype(str).unique().tolist()
+
+    print(f"🔥 Warming TMDb cache for {len(tconsts)} titles ({len(cache.cached_tconsts(tconsts))} already cached)")
+
+    # cached titles answer from SQLite, so only the missing ones cost requests
+    engine = TmdbLookupEngine(cache=cache)
+
+    try:
+        await engine.lookup_many(tconsts)
+    finally:
+        await engine.aclose()
+
+    removed = cache.purge_expired()
+
+    print(f"✅ TMDb cache warm: {engine.stats}, cache {cache.stats}, purged {removed} expired entries")
+
+
+if __name__ == "__main__":
+
+    # usage: python tmdb_cache.py warm <movies.csv>
+    load_dotenv()
+
+    if len(sys.argv) != 3 or sys.argv[1] != "warm":
+        sys.exit("usage: python tmdb_cache.py warm <movies.csv>")
+
+    asyncio.run(warm_from_csv(sys.argv[2]))
@@ -0,0 +1,245 @@
+import os
+import time
+import httpx
+import random
+import asyncio
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+
+TMDB_SEARCH_URL = "https://api.themoviedb.org/3/find/{tconst}"
+TMDB_VIDEO_URL = "https://api.themoviedb.org/3/movie/{tmdb_id}/videos"
+
+RETRYABLE_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.ReadTimeout, httpx.ReadError, httpx.RemoteProtocolError, httpx.PoolTimeout)
+
+
+def parse_retry_after(value, default=30.0):
+
+    if value is None:
+        return default
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return default
+
+
+class TokenBucket:
+
+    def __init__(self, rate, capacity=None, min_rate=None):
+
+        self.max_rate = float(rate)
+        self.rate = float(rate)
+        self.min_rate = float(min_rate or max(1.0, rate / 10))
+
+        self.capacity = float(capacity or rate)
+        self.tokens = self.capacity
+
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+        self.lock = asyncio.Lock()
+
+
+
+    async def acquire(self):
+
+        # callers queue on the lock, so tokens are handed out in arrival order
+        async with self.lock:
+            while True:
+
+                now = time.monotonic()
+
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+
+    def throttle(self, retry_after):
+
+        # the server told us to back off: everyone pauses, and the rate drops until it earns its way back
+        self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+        self.rate = max(self.min_rate, self.rate * 0.7)
+        self.tokens = 0.0
+
+
+
+    def succeeded(self):
+
+        if self.rate < self.max_rate:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * 0.02)
+
+
+class TmdbLookupEngine:
+
+    def __init__(self, api_key=None, rate=None, concurrency=None, max_retries=None, max_retry_wait=None, timeout=None, cache=None):
+
+        self.api_key = api_key or os.getenv("TMDB_API_KEY")
+        if not self.api_key:
+            raise ValueError("TMDB_API_KEY is not set in the environment variables.")
+
+        # TMDb allows roughly 50 requests/second per IP, stay a little under it by default
+        self.bucket = TokenBucket(float(rate or os.getenv("TMDB_RATE_LIMIT", 40)))
+
+        self.concurrency = int(concurrency or os.getenv("TMDB_CONCURRENCY", 32))
+
+        self.max_retries = int(max_retries if max_retries is not None else os.getenv("TMDB_MAX_RETRIES", 5))
+
+        self.max_retry_wait = float(max_retry_wait or os.getenv("TMDB_MAX_RETRY_WAIT", 60))
+
+        self.http_client = httpx.AsyncClient(
+            timeout=float(timeout or os.getenv("TMDB_TIMEOUT", 10)),
+            limits=httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency),
+        )
+
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+
+        # optional TmdbCache consulted before any request goes out
+        self.cache = cache
+
+        self.stats = {"requests": 0, "rate_limited": 0, "retries": 0, "errors": 0}
+
+
+
+    async def get_json(self, url, params):
+
+        # returns the decoded body ({} for a 404), None when the lookup failed, False when TMDb asked for a wait above max_retry_wait
+        params = {"api_key": self.api_key, **params}
+
+        for attempt in range(self.max_retries + 1):
+
+            await self.bucket.acquire()
+            self.stats["requests"] += 1
+
+            try:
+                async with self.semaphore:
+                    response = await self.http_client.get(url, params=params)
+
+            except RETRYABLE_ERRORS as e:
+                delay = min(30.0, 2 ** attempt) * random.uniform(0.5, 1.0)
+                print(f"⏳Network error on {url} ({e}), retrying in {delay:.1f}s")
+                self.stats["retries"] += 1
+                await asyncio.sleep(delay)
+                continue
+
+            if response.status_code == 429:
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                self.stats["rate_limited"] += 1
+
+                if retry_after > self.max_retry_wait:
+                    print(f"⛔ Retry-After too long ({retry_after:.0f}s) for {url}")
+                    return False
+
+                self.bucket.throttle(retry_after)
+                self.stats["retries"] += 1
+                continue
+
+            if response.status_code >= 500:
+                self.stats["retries"] += 1
+                await asyncio.sleep(min(30.0, 2 ** attempt) * random.uniform(0.5, 1.0))
+                continue
+
+            if response.status_code == 404:
+                return {}
+
+            try:
+                response.raise_for_status()
+            except httpx.HTTPStatusError as e:
+                print(f"❌ TMDb request failed for {url}: {e}")
+                self.stats["errors"] += 1
+                return None
+
+            self.bucket.succeeded()
+            return response.json()
+
+        print(f"❌ Giving up on {url} after {self.max_retries + 1} attempts")
+        self.stats["errors"] += 1
+        return None
+
+
+
+    async def find_movie(self, tconst):
+
+        if self.cache is not None:
+            hit, movie = self.cache.get_movie(tconst)
+            if hit:
+                return movie
+
+        body = await self.get_json(TMDB_SEARCH_URL.format(tconst=tconst), {"external_source": "imdb_id"})
+
+        # failures and skips are not answers, only a real reply is worth caching
+        if body is None or body is False:
+            return body
+
+        results = body.get("movie_results", [])
+        movie = results[0] if results else None
+
+        if self.cache is not None:
+            self.cache.put_movie(tconst, movie)
+
+        return movie
+
+
+
+    async def find_trailer_url(self, tmdb_id):
+
+        if self.cache is not None:
+            hit, url = self.cache.get_trailer(tmdb_id)
+            if hit:
+                return url
+
+        body = await self.get_json(TMDB_VIDEO_URL.format(tmdb_id=tmdb_id), {})
+
+        if body is None or body is False:
+            return body
+
+        url = None
+
+        for video in body.get("results", []):
+            if video["type"] == "Trailer" and video["site"] == "YouTube":
+                url = f"https://www.youtube.com/watch?v={video['key']}"
+                break
+
+        if self.cache is not None:
+            self.cache.put_trailer(tmdb_id, url)
+
+        return url
+
+
+
+    async def lookup(self, tconst):
+
+        # (movie, trailer_url): movie is None when TMDb has no match, trailer_url is False when the lookup was skipped
+        movie = await self.find_movie(tconst)
+
+        if not movie:
+            return movie, None
+
+        return movie, await self.find_trailer_url(movie["id"])
+
+
+
+    async def lookup_many(self, tconsts):
+
+        return await asyncio.gather(*(self.lookup(tconst) for tconst in tconsts))
+
+
+
+    async def aclose(self):
+
+        await self.http_client.aclose()